@@ -0,0 +1,47 @@
+# ecommerce_backend/batch.py
+from typing import Dict, List, Optional, Type
+from bson import ObjectId
+from pydantic import BaseModel
+from serialization import build_item
+
+# Batch lookups: one $in per chunk of ids, answered in input order with a
+# status per id so callers can tell missing documents from malformed ids.
+FOUND, NOT_FOUND, INVALID_ID = "found", "not_found", "invalid_id"
+
+
+def parse_ids(raw_ids: List[str]) -> List[Optional[ObjectId]]:
+    return [ObjectId(raw) if ObjectId.is_valid(raw) else None for raw in raw_ids]
+
+
+def model_projection(model: Type[BaseModel]) -> dict:
+    return {field.alias or name: 1 for name, field in model.model_fields.items()}
+
+
+async def fetch_by_ids(collection, ids: List[Optional[ObjectId]], projection: dict) -> Dict[ObjectId, dict]:
+    wanted = list({oid for oid in ids if oid is not None})
+    if not wanted:
+        return {}
+    return {doc["_id"]: doc async for doc in collection.find({"_id": {"$in": wanted}}, projection)}
+
+
+def batch_entries(raw_ids: List[str], ids: List[Optional[ObjectId]], found: Dict[ObjectId, dict],
+                  model: Type[BaseModel]) -> List[dict]:
+    entries = []
+    for raw, oid in zip(raw_ids, ids):
+        doc = found.get(oid) if oid is not None else None
+        if doc is not None:
+            entries.append({"id": raw, "status": FOUND, "item": build_item(doc, model)})
+        else:
+            entries.append({"id": raw, "status": INVALID_ID if oid is None else NOT_FOUND, "item": None})
+    return entries
+
+
+async def iter_batch_entries(collection, raw_ids: List[str], model: Type[BaseModel], chunk_size: int):
+    """Entries for a large batch, fetched `chunk_size` ids at a time."""
+    projection = model_projection(model)
+    for start in range(0, len(raw_ids), chunk_size):
+        chunk = raw_ids[start:start + chunk_size]
+        ids = parse_ids(chunk)
+        found = await fetch_by_ids(collection, ids, projection)
+        for entry in batch_entries(chunk, ids, found, model):
+            yield entry
@@ -0,0 +1,105 @@
+# ecommerce_backend/benchmarks/bench_serialization.py
+"""Microbenchmark: Pydantic response path vs trusted-output fast path.
+
+No database needed; documents are synthesised in memory with the same shape
+the handlers read from MongoDB.
+
+    python -m benchmarks.bench_serialization --docs 1000 --runs 50
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from bson import ObjectId
+from pydantic import TypeAdapter
+
+from models import EnhancedOrderResponse, SearchProductResponse
+from serialization import dumps, shape_document
+
+
+def make_products(n: int, rng: random.Random) -> List[dict]:
+    now = datetime(2024, 1, 1)
+    return [{
+        "_id": ObjectId(),
+        "name": f"Product {i}",
+        "description": "Synthetic product used for serialization benchmarks.",
+        "category": rng.choice(["Laptops", "Audio", "Monitors", "Accessories"]),
+        "price": round(rng.uniform(5, 2500), 2),
+        "brand": rng.choice(["HP", "Apple", "Sony", "Dell", "Logitech"]),
+        "rating": {"average": round(rng.uniform(1, 5), 1), "count": rng.randint(0, 500)},
+        "stock": rng.randint(0, 1000),
+        "created_at": now - timedelta(days=rng.randint(0, 900)),
+        "updated_at": now,
+        "score": rng.random(),
+    } for i in range(n)]
+
+
+def make_orders(n: int, rng: random.Random) -> List[dict]:
+    user_id = ObjectId()
+    orders = []
+    for _ in range(n):
+        lines = [{
+            "product_id": ObjectId(),
+            "name": "Product",
+            "price_at_purchase": round(rng.uniform(5, 2500), 2),
+            "quantity": rng.randint(1, 3),
+            "description": "Synthetic product used for serialization benchmarks.",
+            "category": "Audio",
+            "brand": "Sony",
+            "current_price": round(rng.uniform(5, 2500), 2),
+        } for _ in range(rng.randint(1, 5))]
+        orders.append({
+            "_id": ObjectId(),
+            "user_id": user_id,
+            "user_name": "Bench User",
+            "user_email": "bench@example.com",
+            "user_location": "Nowhere",
+            "products": lines,
+            "total_cost": sum(line["price_at_purchase"] * line["quantity"] for line in lines),
+            "status": "completed",
+            "timestamp": datetime(2024, 1, 1) + timedelta(minutes=rng.randint(0, 10 ** 6)),
+        })
+    return orders
+
+
+def pydantic_path(docs, model, adapter):
+    # What the handlers did before: build models, then FastAPI validates the
+    # return value against response_model and dumps it
+    models = [model(**doc) for doc in docs]
+    return adapter.dump_json(adapter.validate_python(models), by_alias=True)
+
+
+def trusted_path(docs, model, _adapter):
+    return dumps([shape_document(doc, model) for doc in docs])
+
+
+def time_it(fn, runs, *args):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main(args):
+    rng = random.Random(42)
+    cases = [
+        ("search products", SearchProductResponse, make_products(args.docs, rng)),
+        ("enhanced orders", EnhancedOrderResponse, make_orders(args.docs, rng)),
+    ]
+    for label, model, docs in cases:
+        adapter = TypeAdapter(List[model])
+        slow = time_it(pydantic_path, args.runs, docs, model, adapter)
+        fast = time_it(trusted_path, args.runs, docs, model, adapter)
+        print(f"{label:<16} x{args.docs}: pydantic {slow:8.2f} ms | trusted {fast:8.2f} ms | {slow / fast:5.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=50)
+    main(parser.parse_args())
@@ -0,0 +1,98 @@
+# ecommerce_backend/benchmarks/bench_top_products.py
+"""Compare the original top-products pipeline with the rollup + per-category heap path.
+
+Run from the project root against the configured MongoDB:
+
+    python -m benchmarks.bench_top_products --runs 20 --days 365 --limit 5
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from database import connect_db, close_db, get_database
+from product_cache import product_cache
+from rollups import ROLLUPS_COLLECTION, top_products_pipeline, top_k_per_category
+
+
+def legacy_pipeline(since: datetime, category, limit: int):
+    # The pipeline /analytics/top-products used before rollups: unwind every
+    # order line, $lookup each product, group, then filter and take a global top N
+    pipeline = [
+        {"$match": {"timestamp": {"$gte": since}}},
+        {"$unwind": "$products"},
+        {"$lookup": {
+            "from": "products",
+            "localField": "products.product_id",
+            "foreignField": "_id",
+            "as": "product_info",
+        }},
+        {"$unwind": "$product_info"},
+        {"$group": {
+            "_id": "$products.product_id",
+            "name": {"$first": "$product_info.name"},
+            "category": {"$first": "$product_info.category"},
+            "brand": {"$first": "$product_info.brand"},
+            "price": {"$first": "$product_info.price"},
+            "purchase_count": {"$sum": 1},
+            "total_quantity_sold": {"$sum": "$products.quantity"},
+        }},
+    ]
+    if category:
+        pipeline.append({"$match": {"category": category}})
+    pipeline.extend([{"$sort": {"purchase_count": -1}}, {"$limit": limit}])
+    return pipeline
+
+
+async def run_legacy(db, since, category, limit):
+    return [doc async for doc in db["orders"].aggregate(legacy_pipeline(since, category, limit))]
+
+
+async def run_rollups(db, since, category, limit):
+    cursor = db[ROLLUPS_COLLECTION].aggregate(top_products_pipeline(since, category))
+    top = await top_k_per_category(cursor, limit)
+    ranked = [row for rows in top.values() for row in rows]
+    await product_cache.get_many(db["products"], [row["_id"] for row in ranked])
+    return ranked
+
+
+async def measure(fn, runs: int, *args):
+    timings = []
+    result = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = await fn(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "rows": len(result),
+        "p50_ms": round(statistics.median(timings), 2),
+        "p95_ms": round(timings[max(0, int(len(timings) * 0.95) - 1)], 2),
+        "min_ms": round(timings[0], 2),
+    }
+
+
+async def main(args):
+    await connect_db()
+    db = get_database()
+    try:
+        since = datetime.utcnow() - timedelta(days=args.days)
+        await product_cache.warm(db["products"])
+        legacy = await measure(run_legacy, args.runs, db, since, args.category, args.limit)
+        rollup = await measure(run_rollups, args.runs, db, since, args.category, args.limit)
+        print(f"legacy pipeline (global top {args.limit}): {legacy}")
+        print(f"rollups + heap (top {args.limit} per category): {rollup}")
+        if rollup["p50_ms"]:
+            print(f"speedup (p50): {legacy['p50_ms'] / rollup['p50_ms']:.1f}x")
+    finally:
+        await close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--days", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=5)
+    parser.add_argument("--category", default=None)
+    asyncio.run(main(parser.parse_args()))
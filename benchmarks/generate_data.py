@@ -0,0 +1,243 @@
+# ecommerce_backend/benchmarks/generate_data.py
+"""Deterministic synthetic seed data in the data/*.json Extended-JSON schema.
+
+Every document is a pure function of (seed, collection, index), so the same
+arguments always produce byte-identical files and other tools (the load
+driver) can derive valid ids without reading the output. Files are written
+one document at a time, so 10^7 records need no more memory than 10^4.
+
+    python -m benchmarks.generate_data --scale 100000 --out benchmarks/data
+    python -m benchmarks.generate_data --products 10000000 --format ndjson
+
+--scale N sets N products and users, 2N orders and 2N reviews; the
+per-collection flags override it. Load the result with
+`DATA_PATH=benchmarks/data python database.py` or bulk_loader.py.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+import orjson
+
+# First ObjectId byte group doubles as a timestamp; keep it plausible (2023)
+_ID_TAGS = {"products": 0x65000001, "users": 0x65000002, "orders": 0x65000003, "reviews": 0x65000004}
+DEFAULT_END_DATE = "2024-12-31"
+
+CATALOG = {
+    "Laptops": (["HP", "Dell", "Apple", "Lenovo", "Asus"], ["Laptop", "Notebook", "Ultrabook", "Chromebook"]),
+    "Audio": (["Sony", "Bose", "JBL", "Sennheiser", "Apple"], ["Headphones", "Earbuds", "Speaker", "Soundbar"]),
+    "Monitors": (["Dell", "LG", "Samsung", "Asus", "BenQ"], ["Monitor", "Display", "Curved Monitor"]),
+    "Accessories": (["Logitech", "Razer", "Anker", "Corsair"], ["Mouse", "Keyboard", "Charger", "Hub", "Webcam"]),
+    "Phones": (["Apple", "Samsung", "Google", "OnePlus"], ["Phone", "Smartphone"]),
+    "Wearables": (["Garmin", "Fitbit", "Apple", "Samsung"], ["Smartwatch", "Fitness Tracker"]),
+}
+CATEGORIES = sorted(CATALOG)
+ADJECTIVES = ["Pro", "Air", "Max", "Ultra", "Lite", "Plus", "Mini", "Studio", "Wireless", "Quiet"]
+FIRST_NAMES = ["Alice", "Bob", "Carol", "David", "Eve", "Frank", "Grace", "Heidi", "Ivan", "Judy", "Mallory", "Oscar"]
+LAST_NAMES = ["Smith", "Jones", "Brown", "Taylor", "Wilson", "Davies", "Evans", "Thomas", "Khan", "Ali", "Lee"]
+LOCATIONS = ["San Francisco, USA", "London, UK", "Lahore, Pakistan", "Berlin, Germany", "Toronto, Canada",
+             "Sydney, Australia", "Tokyo, Japan", "Karachi, Pakistan"]
+STATUSES = ["completed"] * 8 + ["shipped", "pending"]
+REVIEW_TEXTS = {
+    1: ["Stopped working after a week.", "Very disappointed with the quality."],
+    2: ["Not worth the price.", "Average at best, had some issues."],
+    3: ["Does the job, nothing special.", "Decent for the price."],
+    4: ["Works well, would recommend.", "Solid product with minor flaws."],
+    5: ["Excellent, exceeded my expectations!", "Fantastic quality and fast delivery."],
+}
+
+
+def object_id(collection: str, index: int) -> str:
+    return f"{_ID_TAGS[collection]:08x}{index:016x}"
+
+
+def _oid(collection: str, index: int) -> dict:
+    return {"$oid": object_id(collection, index)}
+
+
+def _date(value: datetime) -> dict:
+    return {"$date": value.strftime("%Y-%m-%dT%H:%M:%SZ")}
+
+
+def _rng(seed: int, collection: str, index: int) -> random.Random:
+    return random.Random(f"{seed}:{collection}:{index}")
+
+
+def _skewed(rng: random.Random, n: int) -> int:
+    # Squaring a uniform draw gives a long-tailed popularity curve
+    return int(n * rng.random() ** 2)
+
+
+BUILDERS = {"products": "product", "users": "user", "orders": "order", "reviews": "review"}
+
+
+class Generator:
+    def __init__(self, seed: int, products: int, users: int, end_date: datetime, days: int):
+        self.seed = seed
+        self.products = products
+        self.users = users
+        self.end_date = end_date
+        self.days = days
+
+    def _timestamp(self, rng: random.Random) -> datetime:
+        return self.end_date - timedelta(seconds=rng.randrange(self.days * 86400))
+
+    def _product_fields(self, rng: random.Random, i: int) -> dict:
+        category = CATEGORIES[i % len(CATEGORIES)]
+        brands, nouns = CATALOG[category]
+        brand = rng.choice(brands)
+        noun = rng.choice(nouns)
+        return {
+            "name": f"{brand} {rng.choice(ADJECTIVES)} {noun} {100 + i % 900}",
+            "description": f"{rng.choice(ADJECTIVES)} {noun.lower()} from {brand} for everyday use.",
+            "category": category,
+            "brand": brand,
+            "price": round(rng.uniform(9.99, 2499.99), 2),
+        }
+
+    def product_fields(self, i: int) -> dict:
+        """Name/category/brand/price of product `i`, as written to products.json."""
+        return self._product_fields(_rng(self.seed, "products", i), i)
+
+    def product(self, i: int) -> dict:
+        rng = _rng(self.seed, "products", i)
+        fields = self._product_fields(rng, i)
+        created = self._timestamp(rng)
+        return {
+            "_id": _oid("products", i),
+            **fields,
+            "rating": {"average": round(rng.uniform(2.5, 5.0), 1), "count": rng.randrange(0, 2000)},
+            "stock": rng.randrange(0, 1000),
+            "created_at": _date(created),
+            "updated_at": _date(created + timedelta(days=rng.randrange(0, 60))),
+        }
+
+    def user(self, i: int) -> dict:
+        rng = _rng(self.seed, "users", i)
+        created = self._timestamp(rng)
+        return {
+            "_id": _oid("users", i),
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "email": f"user{i}@example.com",
+            "location": rng.choice(LOCATIONS),
+            "created_at": _date(created),
+            "updated_at": _date(created),
+        }
+
+    def order(self, i: int) -> dict:
+        rng = _rng(self.seed, "orders", i)
+        lines = []
+        for _ in range(rng.randint(1, 4)):
+            p = _skewed(rng, self.products)
+            product = self.product_fields(p)
+            lines.append({
+                "product_id": _oid("products", p),
+                "name": product["name"],
+                "price_at_purchase": product["price"],
+                "quantity": rng.randint(1, 3),
+            })
+        return {
+            "_id": _oid("orders", i),
+            "user_id": _oid("users", rng.randrange(self.users)),
+            "products": lines,
+            "total_cost": round(sum(line["price_at_purchase"] * line["quantity"] for line in lines), 2),
+            "timestamp": _date(self._timestamp(rng)),
+            "status": rng.choice(STATUSES),
+        }
+
+    def review(self, i: int) -> dict:
+        rng = _rng(self.seed, "reviews", i)
+        rating = rng.choices([1, 2, 3, 4, 5], weights=[1, 1, 2, 4, 6])[0]
+        return {
+            "_id": _oid("reviews", i),
+            "user_id": _oid("users", rng.randrange(self.users)),
+            "product_id": _oid("products", _skewed(rng, self.products)),
+            "rating": rating,
+            "review_text": rng.choice(REVIEW_TEXTS[rating]),
+            "timestamp": _date(self._timestamp(rng)),
+        }
+
+
+CHUNK_DOCUMENTS = 5000
+
+
+def render_chunk(task) -> bytes:
+    """Encode documents [start, stop) of one collection; runs in worker processes."""
+    generator, name, start, stop, fmt = task
+    build = getattr(generator, BUILDERS[name])
+    docs = [orjson.dumps(build(i)) for i in range(start, stop)]
+    if fmt == "ndjson":
+        return b"".join(doc + b"\n" for doc in docs)
+    return b",\n".join(docs)
+
+
+def write_collection(path: str, generator: Generator, name: str, count: int, fmt: str, pool=None) -> int:
+    tasks = [
+        (generator, name, start, min(start + CHUNK_DOCUMENTS, count), fmt)
+        for start in range(0, count, CHUNK_DOCUMENTS)
+    ]
+    # imap keeps chunk order, so output is identical whatever the worker count
+    chunks = pool.imap(render_chunk, tasks) if pool else map(render_chunk, tasks)
+    with open(path, "wb") as f:
+        if fmt == "json":
+            f.write(b"[\n")
+        for index, chunk in enumerate(chunks):
+            if fmt == "json" and index:
+                f.write(b",\n")
+            f.write(chunk)
+        if fmt == "json":
+            f.write(b"\n]\n")
+    return count
+
+
+def counts_from_args(args) -> dict:
+    scale = args.scale
+    return {
+        "products": args.products or scale,
+        "users": args.users or scale,
+        "orders": args.orders or 2 * scale,
+        "reviews": args.reviews or 2 * scale,
+    }
+
+
+def add_scale_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--scale", type=int, default=10000, help="Products/users count; orders and reviews get 2x")
+    parser.add_argument("--products", type=int)
+    parser.add_argument("--users", type=int)
+    parser.add_argument("--orders", type=int)
+    parser.add_argument("--reviews", type=int)
+    parser.add_argument("--seed", type=int, default=42)
+
+
+def main(args):
+    counts = counts_from_args(args)
+    end_date = datetime.fromisoformat(args.end_date).replace(tzinfo=timezone.utc)
+    generator = Generator(args.seed, counts["products"], counts["users"], end_date, args.days)
+    os.makedirs(args.out, exist_ok=True)
+
+    pool = multiprocessing.Pool(args.workers) if args.workers > 1 else None
+    try:
+        for name in BUILDERS:
+            path = os.path.join(args.out, f"{name}.json")
+            start = time.monotonic()
+            written = write_collection(path, generator, name, counts[name], args.format, pool)
+            elapsed = time.monotonic() - start
+            print(f"Wrote {written} {name} to {path} in {elapsed:.1f}s")
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_scale_arguments(parser)
+    parser.add_argument("--out", default=os.path.join(os.path.dirname(__file__), "data"))
+    parser.add_argument("--format", choices=["json", "ndjson"], default="json",
+                        help="JSON array (like data/*.json) or one document per line")
+    parser.add_argument("--end-date", default=DEFAULT_END_DATE, help="Latest timestamp (fixed for reproducibility)")
+    parser.add_argument("--days", type=int, default=730, help="Spread timestamps over this many days")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Encoding processes")
+    main(parser.parse_args())
@@ -0,0 +1,201 @@
+# ecommerce_backend/benchmarks/load_driver.py
+"""Async load driver for the read endpoints, reporting p50/p95/p99 and throughput.
+
+Ids are derived from benchmarks.generate_data, so pass the same --scale (or
+per-collection counts and --seed) that generated the loaded data.
+
+    # a running server (python -m uvicorn main:app) backed by mongod
+    python -m benchmarks.load_driver --base-url http://127.0.0.1:8000 --scale 100000
+
+    # the app in-process against the configured mongod, seeded from --data-dir
+    python -m benchmarks.load_driver --in-process --data-dir benchmarks/data --scale 100000
+
+    # in-process on mongomock-motor, no mongod needed (see mongomock_compat)
+    python -m benchmarks.load_driver --in-process --mongomock --data-dir benchmarks/data --scale 1000
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import httpx
+
+from benchmarks.generate_data import CATALOG, add_scale_arguments, counts_from_args, object_id
+
+ENDPOINT_WEIGHTS = {"search": 4, "user_orders": 2, "reviews": 2, "order": 2, "top_products": 1}
+SEARCH_TERMS = sorted({word for brands, nouns in CATALOG.values() for word in brands + nouns})
+
+
+def _typo(word: str, rng: random.Random) -> str:
+    if len(word) < 4:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def build_requests(args, counts: dict) -> List[Tuple[str, str]]:
+    """Deterministic (endpoint, url) list for the run, warm-up first."""
+    rng = random.Random(args.seed)
+    endpoints = [name for name in ENDPOINT_WEIGHTS if not args.only or name in args.only]
+    weights = [ENDPOINT_WEIGHTS[name] for name in endpoints]
+    requests = []
+    for _ in range(args.warmup + args.requests):
+        endpoint = rng.choices(endpoints, weights)[0]
+        if endpoint == "search":
+            term = rng.choice(SEARCH_TERMS)
+            if args.mongomock:
+                # Two characters skip the $text pass, which mongomock lacks
+                term = term[:2]
+            elif rng.random() < 0.3:
+                term = _typo(term, rng)
+            url = f"/products/search?query={term.lower()}&limit=20"
+        elif endpoint == "user_orders":
+            url = f"/users/{object_id('users', rng.randrange(counts['users']))}/orders?limit=20"
+        elif endpoint == "reviews":
+            # Same skew the generator uses, so most products asked about have reviews
+            product = int(counts["products"] * rng.random() ** 2)
+            url = f"/products/{object_id('products', product)}/reviews?limit=20"
+        elif endpoint == "order":
+            url = f"/orders/{object_id('orders', rng.randrange(counts['orders']))}"
+        else:
+            url = "/analytics/top-products?days=3650&limit=5"
+        requests.append((endpoint, url))
+    return requests
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+async def drive(client: httpx.AsyncClient, requests: List[Tuple[str, str]], concurrency: int, warmup: int):
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    position = 0
+    measure_start = None
+
+    async def worker():
+        nonlocal position, measure_start
+        while position < len(requests):
+            index = position
+            position += 1
+            if index == warmup and measure_start is None:
+                measure_start = time.perf_counter()
+            endpoint, url = requests[index]
+            start = time.perf_counter()
+            try:
+                response = await client.get(url)
+                ok = response.status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            elapsed = time.perf_counter() - start
+            if index < warmup:
+                continue
+            latencies[endpoint].append(elapsed * 1000)
+            if not ok:
+                errors[endpoint] += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - (measure_start or time.perf_counter())
+    return latencies, errors, wall
+
+
+def summarize(latencies, errors, wall: float) -> dict:
+    report = {}
+    everything = []
+    for endpoint in sorted(latencies):
+        values = sorted(latencies[endpoint])
+        everything.extend(values)
+        report[endpoint] = {
+            "requests": len(values),
+            "errors": errors.get(endpoint, 0),
+            "p50_ms": round(percentile(values, 50), 2),
+            "p95_ms": round(percentile(values, 95), 2),
+            "p99_ms": round(percentile(values, 99), 2),
+            "throughput_rps": round(len(values) / wall, 1) if wall else 0.0,
+        }
+    everything.sort()
+    report["total"] = {
+        "requests": len(everything),
+        "errors": sum(errors.values()),
+        "p50_ms": round(percentile(everything, 50), 2),
+        "p95_ms": round(percentile(everything, 95), 2),
+        "p99_ms": round(percentile(everything, 99), 2),
+        "throughput_rps": round(len(everything) / wall, 1) if wall else 0.0,
+    }
+    return report
+
+
+def print_report(report: dict):
+    print(f"{'endpoint':<14}{'requests':>10}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}")
+    for endpoint, row in report.items():
+        print(f"{endpoint:<14}{row['requests']:>10}{row['errors']:>8}{row['p50_ms']:>10}"
+              f"{row['p95_ms']:>10}{row['p99_ms']:>10}{row['throughput_rps']:>10}")
+
+
+async def in_process_client(args) -> httpx.AsyncClient:
+    import os
+    if args.mongomock:
+        from benchmarks import mongomock_compat
+        mongomock_compat.install()
+
+    import database
+    import main
+    from config import settings
+
+    if args.data_dir:
+        settings.data_path = args.data_dir
+        settings.fuzzy_index_path = os.path.join(args.data_dir, "fuzzy_index.json.gz")
+    # ASGITransport does not run lifespan events; initialise and wait for readiness here
+    settings.startup_mode = "blocking"
+    await database.init_db()
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench")
+
+
+async def run(args):
+    counts = counts_from_args(args)
+    requests = build_requests(args, counts)
+    if args.in_process:
+        client = await in_process_client(args)
+    else:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        client = httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout)
+    try:
+        latencies, errors, wall = await drive(client, requests, args.concurrency, args.warmup)
+    finally:
+        await client.aclose()
+        if args.in_process:
+            import database
+            await database.close_db()
+
+    report = summarize(latencies, errors, wall)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "wall_seconds": round(wall, 3), "endpoints": report}, f, indent=2, default=sorted)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    add_scale_arguments(parser)
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--in-process", action="store_true", help="Drive main.app through ASGITransport")
+    parser.add_argument("--mongomock", action="store_true", help="With --in-process: use mongomock-motor")
+    parser.add_argument("--data-dir", help="With --in-process: seed from this directory")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--only", type=lambda value: set(value.split(",")),
+                        help=f"Comma-separated subset of: {', '.join(ENDPOINT_WEIGHTS)}")
+    parser.add_argument("--output", help="Also write the report as JSON")
+    args = parser.parse_args()
+    if args.mongomock and not args.in_process:
+        parser.error("--mongomock requires --in-process")
+    asyncio.run(run(args))
@@ -0,0 +1,52 @@
+# ecommerce_backend/benchmarks/mongomock_compat.py
+"""Run the app in-process on mongomock-motor for quick, mongod-free load runs.
+
+mongomock trails the server and PyMongo in a few places the app relies on;
+install() papers over them for benchmarking only. Latencies measured this way
+reflect the Python request path, not MongoDB, and $text search is not
+available (the load driver sends short queries that skip the text pass).
+"""
+
+
+def install():
+    import mongomock.collection
+    import mongomock_motor
+    from mongomock import aggregate
+
+    import database
+
+    # PyMongo 4.9+ passes sort= to the bulk builder for UpdateOne/ReplaceOne
+    builder = mongomock.collection.BulkOperationBuilder
+    for method in ("add_update", "add_replace"):
+        original = getattr(builder, method)
+
+        def without_sort(self, *args, _original=original, sort=None, **kwargs):
+            return _original(self, *args, **kwargs)
+        setattr(builder, method, without_sort)
+
+    # $indexOfArray, used to carry fuzzy-match similarities into the pipeline
+    handle_array = aggregate._Parser._handle_array_operator
+
+    def handle_array_operator(self, operator, values):
+        if operator == "$indexOfArray":
+            array, item = self.parse(values[0]), self.parse(values[1])
+            return list(array).index(item) if item in array else -1
+        return handle_array(self, operator, values)
+    aggregate._Parser._handle_array_operator = handle_array_operator
+    if "$indexOfArray" not in aggregate.array_operators:
+        aggregate.array_operators.append("$indexOfArray")
+
+    # with_options() (read policies) must return an async collection again
+    collection_cls = mongomock_motor.AsyncMongoMockCollection
+
+    def with_options(self, *args, **kwargs):
+        sync_collection = self._AsyncMongoMockCollection__collection
+        return collection_cls(self.database, sync_collection.with_options(*args, **kwargs))
+    collection_cls.with_options = with_options
+
+    class Client(mongomock_motor.AsyncMongoMockClient):
+        def __init__(self, uri=None, **options):
+            # Pool, compression and listener options mean nothing here
+            super().__init__(uri)
+
+    database.AsyncIOMotorClient = Client
@@ -0,0 +1,237 @@
+# ecommerce_backend/bulk_loader.py
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Iterator, Optional, Tuple
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+# Streaming Extended-JSON importer. Documents are decoded one array element
+# (or NDJSON line) at a time, with $oid/$date converted by the decoder's
+# object_hook, and inserted in bounded unordered batches with several batches
+# in flight. Progress is checkpointed so an interrupted load can resume.
+READ_CHUNK_SIZE = 1 << 20
+DUPLICATE_KEY = 11000
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _parse_date(value):
+    if isinstance(value, dict):
+        value = int(value["$numberLong"])
+    if isinstance(value, (int, float)):
+        return _EPOCH + timedelta(milliseconds=value)
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def extended_json_hook(obj: dict):
+    if len(obj) == 1:
+        if "$oid" in obj:
+            return ObjectId(obj["$oid"])
+        if "$date" in obj:
+            return _parse_date(obj["$date"])
+        if "$numberLong" in obj or "$numberInt" in obj:
+            return int(next(iter(obj.values())))
+        if "$numberDouble" in obj:
+            return float(obj["$numberDouble"])
+    return obj
+
+
+_decoder = json.JSONDecoder(object_hook=extended_json_hook)
+
+
+def _iter_array(f, buf: str) -> Iterator[dict]:
+    pos = buf.index("[") + 1
+    eof = False
+    while True:
+        # Skip separators between elements
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf) or eof:
+                break
+            chunk = f.read(READ_CHUNK_SIZE)
+            eof = not chunk
+            buf, pos = buf[pos:] + chunk, 0
+        if pos >= len(buf):
+            raise ValueError("Unexpected end of JSON array")
+        if buf[pos] == "]":
+            return
+        try:
+            doc, end = _decoder.raw_decode(buf, pos)
+            # A value touching the end of the buffer may be cut short (numbers)
+            if end < len(buf) or eof:
+                yield doc
+                pos = end
+                continue
+        except json.JSONDecodeError:
+            if eof:
+                raise
+        chunk = f.read(READ_CHUNK_SIZE)
+        eof = not chunk
+        buf, pos = buf[pos:] + chunk, 0
+
+
+def iter_documents(path: str) -> Iterator[dict]:
+    """Yield documents from a JSON array file or an NDJSON file."""
+    with open(path, "r", encoding="utf-8-sig") as f:
+        head = f.read(READ_CHUNK_SIZE)
+        # Leading whitespace can fill the first chunk; read until the format shows
+        while head and not head.strip():
+            chunk = f.read(READ_CHUNK_SIZE)
+            if not chunk:
+                return
+            head += chunk
+        if head.lstrip().startswith("["):
+            yield from _iter_array(f, head)
+            return
+        lines = head.splitlines(keepends=True)
+        carry = ""
+        while True:
+            if lines and not lines[-1].endswith("\n"):
+                carry = lines.pop()
+            for line in lines:
+                if line.strip():
+                    yield _decoder.decode(line)
+            chunk = f.read(READ_CHUNK_SIZE)
+            if not chunk:
+                if carry.strip():
+                    yield _decoder.decode(carry)
+                return
+            lines = (carry + chunk).splitlines(keepends=True)
+            carry = ""
+
+
+def checkpoint_path_for(path: str, collection_name: str) -> str:
+    return f"{path}.{collection_name}.checkpoint"
+
+
+def _read_checkpoint(path: str) -> int:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return int(json.load(f).get("committed", 0))
+    except (OSError, ValueError):
+        return 0
+
+
+def _write_checkpoint(path: str, committed: int):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"committed": committed, "updated_at": datetime.utcnow().isoformat()}, f)
+    os.replace(tmp_path, path)
+
+
+async def _insert_batch(collection, docs):
+    try:
+        await collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        # Re-inserting documents from a resumed, partially written batch
+        fatal = [err for err in e.details.get("writeErrors", []) if err.get("code") != DUPLICATE_KEY]
+        if fatal:
+            raise
+
+
+async def bulk_load(
+    collection,
+    file_path: str,
+    batch_size: int = 1000,
+    concurrency: int = 4,
+    resume: bool = True,
+    progress_interval: float = 5.0,
+    transform: Optional[Callable[[dict], dict]] = None,
+) -> Tuple[int, float]:
+    """Stream `file_path` into `collection`; returns (documents inserted, seconds)."""
+    checkpoint = checkpoint_path_for(file_path, collection.name)
+    committed = _read_checkpoint(checkpoint) if resume else 0
+    if committed:
+        print(f"Resuming '{collection.name}' load after {committed} committed documents")
+
+    semaphore = asyncio.Semaphore(concurrency)
+    pending = set()
+    done_batches: dict = {}
+    next_batch = 0
+    state = {"committed": committed, "inserted": 0, "last_report": time.monotonic()}
+    start = time.monotonic()
+
+    async def run_batch(seq: int, docs):
+        try:
+            await _insert_batch(collection, docs)
+        except Exception as e:
+            # Surfaced by the producer loop; the task itself ends quietly
+            state.setdefault("error", e)
+            return
+        finally:
+            semaphore.release()
+        done_batches[seq] = len(docs)
+        # Only advance the checkpoint over a contiguous prefix of finished batches
+        nonlocal next_batch
+        while next_batch in done_batches:
+            state["committed"] += done_batches.pop(next_batch)
+            next_batch += 1
+        state["inserted"] += len(docs)
+        now = time.monotonic()
+        if now - state["last_report"] >= progress_interval:
+            state["last_report"] = now
+            _write_checkpoint(checkpoint, state["committed"])
+            rate = state["inserted"] / (now - start)
+            print(f"  {collection.name}: {state['inserted']} documents ({rate:,.0f} docs/s)")
+
+    async def submit(seq: int, docs):
+        await semaphore.acquire()
+        if "error" in state:
+            semaphore.release()
+            raise state["error"]
+        task = asyncio.create_task(run_batch(seq, docs))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+
+    seq = 0
+    batch = []
+    try:
+        for index, doc in enumerate(iter_documents(file_path)):
+            if index < committed:
+                continue
+            batch.append(transform(doc) if transform else doc)
+            if len(batch) >= batch_size:
+                await submit(seq, batch)
+                seq += 1
+                batch = []
+        if batch:
+            await submit(seq, batch)
+        if pending:
+            await asyncio.gather(*pending)
+        if "error" in state:
+            raise state["error"]
+    except BaseException:
+        for task in pending:
+            task.cancel()
+        _write_checkpoint(checkpoint, state["committed"])
+        raise
+
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    elapsed = time.monotonic() - start
+    rate = state["inserted"] / elapsed if elapsed else 0
+    print(f"Loaded {state['inserted']} documents into '{collection.name}' in {elapsed:.1f}s ({rate:,.0f} docs/s)")
+    return state["inserted"], elapsed
+
+
+if __name__ == "__main__":
+    import argparse
+    from bulk_writes import run_with_database
+    from database import SEED_TRANSFORMS
+
+    parser = argparse.ArgumentParser(description="Stream an Extended-JSON array or NDJSON file into a collection")
+    parser.add_argument("collection")
+    parser.add_argument("file")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--no-resume", action="store_true", help="Ignore any saved checkpoint")
+    args = parser.parse_args()
+
+    run_with_database(lambda db: bulk_load(
+        db[args.collection], args.file,
+        batch_size=args.batch_size, concurrency=args.concurrency, resume=not args.no_resume,
+        transform=SEED_TRANSFORMS.get(args.collection),
+    ))
@@ -0,0 +1,36 @@
+# ecommerce_backend/bulk_writes.py
+import asyncio
+from typing import AsyncIterable, Awaitable, Callable, List
+
+# Shared plumbing for the maintenance jobs (backfills and rebuilds): batched
+# unordered bulk writes, and running a job as a script.
+
+
+async def bulk_write_batched(collection, ops: AsyncIterable, batch_size: int = 1000) -> int:
+    """Send write models in unordered bulk_writes of up to `batch_size`; returns how many were sent."""
+    batch: List = []
+    written = 0
+    async for op in ops:
+        batch.append(op)
+        if len(batch) >= batch_size:
+            await collection.bulk_write(batch, ordered=False)
+            written += len(batch)
+            batch = []
+    if batch:
+        await collection.bulk_write(batch, ordered=False)
+        written += len(batch)
+    return written
+
+
+def run_with_database(job: Callable[..., Awaitable]):
+    """Run `job(db)` on a fresh connection: the `python <module>.py` entry points."""
+    from database import close_db, connect_db, get_database
+
+    async def _main():
+        await connect_db()
+        try:
+            return await job(get_database())
+        finally:
+            await close_db()
+
+    return asyncio.run(_main())
@@ -1,11 +1,73 @@
 # ecommerce_backend/config.py
 from pydantic_settings import BaseSettings, SettingsConfigDict
+from typing import Dict, List, Optional
 import os
 
 class Settings(BaseSettings):
     mongodb_uri: str = "mongodb://localhost:27017/"
     mongodb_db_name: str = "ecommerce_db"
+    mongodb_max_pool_size: int = 100
+    mongodb_min_pool_size: int = 0
+    # How long a request may wait for a free pooled connection (None: no limit)
+    mongodb_wait_queue_timeout_ms: Optional[int] = None
+    # Comma-separated wire compressors, e.g. "zstd,snappy" (needs zstandard / python-snappy)
+    mongodb_compressors: str = ""
+    mongodb_read_preference: str = "primary"
+    # Per-endpoint read routing, applied with Collection.with_options()
+    read_policies: Dict[str, Dict[str, str]] = {
+        "search": {"read_preference": "secondaryPreferred", "read_concern": "local"},
+        "analytics": {"read_preference": "secondaryPreferred", "read_concern": "majority"},
+        "order_detail": {"read_preference": "primary", "read_concern": "local"},
+    }
     data_path: str = os.path.join(os.path.dirname(__file__), "data")
+    seed_batch_size: int = 1000
+    seed_concurrency: int = 4
+    # "background" serves requests while indexes/seed/caches are prepared
+    # (see /health for readiness); "blocking" finishes all of it first
+    startup_mode: str = "background"
+    # Disable when seeding is done separately with `python database.py`
+    seed_on_startup: bool = True
+    fuzzy_index_path: str = os.path.join(os.path.dirname(__file__), "data", "fuzzy_index.json.gz")
+    fuzzy_candidate_limit: int = 200
+    # Incremental index updates are re-saved to the snapshot after this delay
+    fuzzy_index_save_delay_seconds: float = 30.0
+    # Search runs ID-only candidate passes (text, fuzzy) before fetching and
+    # ranking the top candidates; each pass is cut off after its budget (0 = none)
+    text_candidate_limit: int = 200
+    search_text_budget_ms: float = 250.0
+    search_fuzzy_budget_ms: float = 100.0
+    # Hybrid ranking: relevance * weight + stored static_score (popularity and price terms)
+    ranking_relevance_weight: float = 0.4
+    ranking_popularity_weight: float = 0.4
+    ranking_price_weight: float = 0.2
+    ranking_popularity_cap: float = 100.0
+    search_cache_max_entries: int = 1024
+    search_cache_ttl_seconds: float = 60.0
+    search_cache_popularity_threshold: int = 100
+    facet_cache_ttl_seconds: float = 300.0
+    # $bucket boundaries for faceted search price counts
+    search_price_buckets: List[float] = [0, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+    # POST /{products,orders,users}/batch: ids per request, and the size above
+    # which the answer is streamed as a chunked JSON array
+    batch_max_ids: int = 1000
+    batch_stream_threshold: int = 200
+    # New orders are queued this long (or until this many) and written in one flush
+    order_batch_window_ms: float = 5.0
+    order_batch_max_orders: int = 500
+    order_bulk_max_orders: int = 1000
+    product_cache_max_entries: int = 50000
+    product_cache_poll_interval_seconds: float = 5.0
+    # Encode documents read from our own DB straight to JSON, skipping the
+    # second response_model validation pass
+    trusted_output: bool = True
+    # Opt-in query plan capture (see /debug/slow-queries)
+    query_profiling: bool = False
+    query_profile_sample_rate: float = 0.01
+    query_profile_explain_interval_seconds: float = 30.0
+    query_profile_max_fingerprints: int = 500
+    slow_query_ms: float = 100.0
+    # docsExamined / nReturned above this is logged as a slow query
+    slow_query_scan_ratio: float = 100.0
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
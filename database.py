@@ -1,135 +1,255 @@
 ﻿# ecommerce_backend/database.py
 from motor.motor_asyncio import AsyncIOMotorClient
-from datetime import datetime
-from bson import ObjectId
-import json
+from pymongo import ReadPreference
+from pymongo.read_concern import ReadConcern
+import asyncio
 import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
 from config import settings
+from popularity import rebuild_popularity
+from fuzzy_index import fuzzy_index
+from product_cache import product_cache
+from search_cache import search_cache
+from facets import facet_dictionary
+from rollups import ROLLUPS_COLLECTION, backfill_rollups
+from ranking import ensure_static_scores
+from order_ingest import backfill_user_order_stats
+from ratings import HISTOGRAM_FIELD, recompute_ratings
+from reviewers import SNAPSHOT_AT, backfill_reviewer_snapshots
+from bulk_loader import bulk_load, checkpoint_path_for
+from indexes import ensure_indexes
+from facets import NORMALIZED_FIELDS, backfill_normalized_fields, with_normalized_fields
+from pool_monitor import pool_monitor
+from metrics import command_metrics
 
 MONGO_URL = settings.mongodb_uri
 DATABASE_NAME = settings.mongodb_db_name
+SEED_COLLECTIONS = ["products", "users", "orders", "reviews"]
+# Derived fields added to seed documents as they are loaded
+SEED_TRANSFORMS = {"products": with_normalized_fields}
 
 class MongoDB:
     client: AsyncIOMotorClient = None
 
 mongo_db = MongoDB()
 
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+_policy_collections = {}
+
 def get_database():
     return mongo_db.client[DATABASE_NAME]
 
-def parse_mongo_json(data):
-    if isinstance(data, dict):
-        if "$oid" in data:
-            return ObjectId(data["$oid"])
-        elif "$date" in data:
-            return datetime.fromisoformat(data["$date"].replace("Z", "+00:00"))
-        else:
-            return {k: parse_mongo_json(v) for k, v in data.items()}
-    elif isinstance(data, list):
-        return [parse_mongo_json(item) for item in data]
-    return data
+def get_collection(name: str, policy: Optional[str] = None):
+    """Collection handle carrying the read preference/concern of a named read policy."""
+    if policy is None or policy not in settings.read_policies:
+        return get_database()[name]
+    key = (name, policy)
+    collection = _policy_collections.get(key)
+    if collection is None:
+        options = settings.read_policies[policy]
+        collection = get_database()[name].with_options(
+            read_preference=READ_PREFERENCES[options.get("read_preference", settings.mongodb_read_preference)],
+            read_concern=ReadConcern(options.get("read_concern")),
+        )
+        _policy_collections[key] = collection
+    return collection
+
+def client_options() -> dict:
+    options = {
+        "maxPoolSize": settings.mongodb_max_pool_size,
+        "minPoolSize": settings.mongodb_min_pool_size,
+        "readPreference": settings.mongodb_read_preference,
+        "event_listeners": [pool_monitor, command_metrics],
+    }
+    if settings.mongodb_wait_queue_timeout_ms is not None:
+        options["waitQueueTimeoutMS"] = settings.mongodb_wait_queue_timeout_ms
+    if settings.mongodb_compressors:
+        options["compressors"] = settings.mongodb_compressors
+    return options
 
 async def load_data_from_json(collection_name: str, file_path: str):
     db = get_database()
     collection = db[collection_name]
 
-    if await collection.count_documents({}) > 0:
+    # A leftover checkpoint means an earlier load was interrupted: resume it
+    resuming = os.path.exists(checkpoint_path_for(file_path, collection_name))
+    if not resuming and await collection.count_documents({}) > 0:
         print(f"Collection '{collection_name}' already has data. Skipping...")
-        return
+        return 0
 
     if os.path.exists(file_path):
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            parsed_data = parse_mongo_json(data)
-            if parsed_data:
-                await collection.insert_many(parsed_data)
-                print(f"Loaded {len(parsed_data)} documents into '{collection_name}'")
+        inserted, _ = await bulk_load(
+            collection, file_path,
+            batch_size=settings.seed_batch_size, concurrency=settings.seed_concurrency,
+            transform=SEED_TRANSFORMS.get(collection_name),
+        )
+        return inserted
     else:
         print(f"File not found: {file_path}")
+    return 0
 
-async def init_db():
-    mongo_db.client = AsyncIOMotorClient(MONGO_URL)
-    db = get_database()
+async def connect_db():
+    mongo_db.client = AsyncIOMotorClient(MONGO_URL, **client_options())
+    _policy_collections.clear()
     print("Connected to MongoDB")
 
-    products_col = db["products"]
-    users_col = db["users"]
-    orders_col = db["orders"]
-    reviews_col = db["reviews"]
-
-    print("Creating indexes...")
-
-    existing_indexes = await products_col.index_information()
-    if "text_search_index" not in existing_indexes:
-        await products_col.create_index([
-            ("name", "text"), ("description", "text"),
-            ("brand", "text"), ("category", "text")
-        ], name="text_search_index", weights={"name": 10, "brand": 5, "category": 3, "description": 1})
-        print("✓ Created text search index")
-
-    if "price_category_index" not in existing_indexes:
-        await products_col.create_index([("price", 1), ("category", 1)], name="price_category_index")
-        print("✓ Created compound index on price + category")
-
-    if "rating_index" not in existing_indexes:
-        await products_col.create_index([("rating.average", -1)], name="rating_index")
-        print("✓ Created index on rating")
-
-    if "brand_index" not in existing_indexes:
-        await products_col.create_index("brand", name="brand_index")
-        print("✓ Created index on brand")
-
-    existing_order_indexes = await orders_col.index_information()
-    def has_index_with_keys(index_info: dict, keys: list):
+class StartupState:
+    """Readiness flag and per-phase cold-start timings (seconds)."""
+    def __init__(self):
+        self.ready = False
+        self.error: Optional[str] = None
+        self.phases: Dict[str, float] = {}
+        self.task: Optional[asyncio.Task] = None
+        self.started = time.monotonic()
+
+    @asynccontextmanager
+    async def phase(self, name: str):
+        start = time.monotonic()
         try:
-            for info in index_info.values():
-                if list(info.get('key', [])) == keys:
-                    return True
-        except Exception:
-            pass
-        return False
-    if "user_id_index" not in existing_order_indexes:
-        await orders_col.create_index("user_id", name="user_id_index")
-        print("✓ Created index on orders.user_id")
-
-    if "timestamp_index" not in existing_order_indexes:
-        await orders_col.create_index([("timestamp", -1)], name="timestamp_index")
-        print("✓ Created index on orders.timestamp")
-
-    # Index to speed up lookups on products in orders for popularity counts
-    products_pid_keys = [("products.product_id", 1)]
-    if not has_index_with_keys(existing_order_indexes, products_pid_keys):
-        await orders_col.create_index(products_pid_keys, name="order_products_product_id_idx")
-        print("✓ Created index on orders.products.product_id")
-    else:
-        print("✓ Index on orders.products.product_id already exists (skipped)")
+            yield
+        finally:
+            self.phases[name] = round(time.monotonic() - start, 3)
+            print(f"[startup] {name}: {self.phases[name]:.3f}s")
 
-    existing_review_indexes = await reviews_col.index_information()
-    if "product_id_index" not in existing_review_indexes:
-        await reviews_col.create_index("product_id", name="product_id_index")
-        print("✓ Created index on reviews.product_id")
+    def snapshot(self) -> dict:
+        return {"ready": self.ready, "error": self.error, "phases": dict(self.phases)}
 
-    if "user_id_review_index" not in existing_review_indexes:
-        await reviews_col.create_index("user_id", name="user_id_review_index")
-        print("✓ Created index on reviews.user_id")
+startup_state = StartupState()
 
-    existing_user_indexes = await users_col.index_information()
-    if "email_index" not in existing_user_indexes:
-        await users_col.create_index("email", unique=True, name="email_index")
-        print("✓ Created unique index on users.email")
+async def _timed_load(collection_name: str):
+    async with startup_state.phase(f"seed.{collection_name}"):
+        return await load_data_from_json(collection_name, os.path.join(settings.data_path, f"{collection_name}.json"))
 
+async def seed_database(db):
+    """Load the JSON seed files (all collections concurrently) and rebuild derived data."""
     print("\nLoading data from JSON files...")
-    data_dir = settings.data_path
-
-    await load_data_from_json("products", os.path.join(data_dir, "products.json"))
-    await load_data_from_json("users", os.path.join(data_dir, "users.json"))
-    await load_data_from_json("orders", os.path.join(data_dir, "orders.json"))
-    await load_data_from_json("reviews", os.path.join(data_dir, "reviews.json"))
+    await asyncio.gather(*(_timed_load(name) for name in SEED_COLLECTIONS))
 
+    products_col = db["products"]
+    orders_col = db["orders"]
+    rollups_col = db[ROLLUPS_COLLECTION]
+
+    # Products loaded before category_norm/brand_norm existed
+    missing_norm = {"$or": [{field: {"$exists": False}} for field in NORMALIZED_FIELDS.values()]}
+    if await products_col.count_documents(missing_norm, limit=1):
+        async with startup_state.phase("normalized_fields"):
+            await backfill_normalized_fields(db)
+
+    # Seeded (or pre-existing) products without counters need a full rebuild
+    if await products_col.count_documents({"popularity": {"$exists": False}}, limit=1):
+        print("\nRebuilding popularity counters...")
+        async with startup_state.phase("popularity"):
+            await rebuild_popularity(db)
+
+    # Stored ranking scores missing, or computed with different weights
+    async with startup_state.phase("static_score"):
+        await ensure_static_scores(db)
+
+    # Seed ratings are static; derive them (and the histograms) from `reviews`
+    if await products_col.count_documents({HISTOGRAM_FIELD: {"$exists": False}}, limit=1):
+        async with startup_state.phase("ratings"):
+            await recompute_ratings(db)
+
+    if await db["reviews"].count_documents({SNAPSHOT_AT: {"$exists": False}}, limit=1):
+        async with startup_state.phase("reviewer_snapshots"):
+            await backfill_reviewer_snapshots(db)
+
+    if await db["users"].count_documents({"order_count": {"$exists": False}}, limit=1):
+        async with startup_state.phase("user_order_stats"):
+            await backfill_user_order_stats(db)
+
+    rollups_missing = (
+        not await rollups_col.estimated_document_count()
+        or await rollups_col.count_documents({"category": {"$exists": False}}, limit=1)
+    )
+    if rollups_missing and await orders_col.estimated_document_count():
+        print("\nBackfilling daily product rollups...")
+        async with startup_state.phase("rollups"):
+            await backfill_rollups(db)
+
+async def _warm_fuzzy_index(products_col):
+    async with startup_state.phase("fuzzy_index"):
+        await fuzzy_index.load_or_build(products_col)
+
+async def _warm_product_cache(products_col):
+    async with startup_state.phase("product_cache"):
+        await product_cache.warm(products_col)
+
+async def prepare_database(seed: bool):
+    db = get_database()
+    try:
+        print("Reconciling indexes...")
+        async with startup_state.phase("indexes"):
+            await ensure_indexes(db)
+        if seed:
+            await seed_database(db)
+
+        # Per-process state: every worker needs its own copy
+        products_col = db["products"]
+        await asyncio.gather(_warm_fuzzy_index(products_col), _warm_product_cache(products_col))
+        product_cache.start(products_col)
+    except Exception as e:
+        startup_state.error = str(e)
+        print(f"Database initialization failed: {e}")
+        raise
+
+    startup_state.ready = True
+    # Requests served before now saw an empty fuzzy index or unseeded data
+    search_cache.invalidate()
+    facet_dictionary.invalidate()
+    # Phases overlap, so the total is wall-clock time rather than their sum
+    startup_state.phases["total"] = round(time.monotonic() - startup_state.started, 3)
     print("\n✓ Database initialization complete!")
 
+async def _prepare_in_background(seed: bool):
+    try:
+        await prepare_database(seed)
+    except Exception:
+        # Already recorded on startup_state; /health reports it
+        pass
+
+async def init_db():
+    startup_state.started = time.monotonic()
+    async with startup_state.phase("connect"):
+        await connect_db()
+
+    if settings.startup_mode == "background":
+        # Serve immediately; /health stays 503 until indexes, seed data and caches are ready
+        startup_state.task = asyncio.create_task(_prepare_in_background(settings.seed_on_startup))
+    else:
+        await prepare_database(settings.seed_on_startup)
+
 async def close_db():
+    task = startup_state.task
+    if task and not task.done():
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    await product_cache.stop()
+    await fuzzy_index.flush()
     if mongo_db.client:
         mongo_db.client.close()
         print("MongoDB connection closed.")
 
+async def _seed_standalone(db):
+    async with startup_state.phase("indexes"):
+        await ensure_indexes(db)
+    await seed_database(db)
+
+
+if __name__ == "__main__":
+    # Seed outside the serving path: python database.py (then run workers with SEED_ON_STARTUP=false)
+    from bulk_writes import run_with_database
+
+    run_with_database(_seed_standalone)
@@ -0,0 +1,47 @@
+# ecommerce_backend/enrichment.py
+from typing import Dict, Iterable, Iterator, List, Optional
+from bson import ObjectId
+
+
+def distinct_product_ids(orders: Iterable[dict]) -> List[ObjectId]:
+    seen: Dict[ObjectId, None] = {}
+    for order in orders:
+        for line in order.get("products") or []:
+            pid = line.get("product_id")
+            if pid is not None:
+                seen.setdefault(pid, None)
+    return list(seen)
+
+
+def enhance_order(order: dict, user: Optional[dict], products_by_id: Dict[ObjectId, dict]) -> dict:
+    user = user or {}
+    lines = []
+    for line in order.get("products") or []:
+        product = products_by_id.get(line.get("product_id")) or {}
+        lines.append({
+            "product_id": line.get("product_id"),
+            "name": line.get("name"),
+            "price_at_purchase": line.get("price_at_purchase"),
+            "quantity": line.get("quantity"),
+            "description": product.get("description"),
+            "category": product.get("category"),
+            "brand": product.get("brand"),
+            "current_price": product.get("price"),
+        })
+    return {
+        "_id": order["_id"],
+        "user_id": order.get("user_id"),
+        "user_name": user.get("name"),
+        "user_email": user.get("email"),
+        "user_location": user.get("location"),
+        "products": lines,
+        "total_cost": order.get("total_cost"),
+        "status": order.get("status"),
+        "timestamp": order.get("timestamp"),
+    }
+
+
+def enhance_orders(orders: Iterable[dict], user: Optional[dict], products_by_id: Dict[ObjectId, dict]) -> Iterator[dict]:
+    for order in orders:
+        yield enhance_order(order, user, products_by_id)
+
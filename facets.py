@@ -0,0 +1,103 @@
+# ecommerce_backend/facets.py
+import asyncio
+import re
+import time
+from typing import Optional
+from pymongo import UpdateOne
+from bulk_writes import bulk_write_batched
+from config import settings
+
+# Lowercased copies of category/brand so search filters can match exactly or
+# by anchored prefix on an index instead of running unanchored /i regexes.
+NORMALIZED_FIELDS = {"category": "category_norm", "brand": "brand_norm"}
+FILTER_MODES = ("exact", "prefix", "regex")
+
+
+def normalize(value) -> str:
+    return " ".join(str(value).split()).lower()
+
+
+def with_normalized_fields(doc: dict) -> dict:
+    """Add category_norm/brand_norm to a product document about to be written."""
+    for field, norm_field in NORMALIZED_FIELDS.items():
+        if doc.get(field) is not None:
+            doc[norm_field] = normalize(doc[field])
+    return doc
+
+
+def stale_normalized_fields(doc: dict) -> dict:
+    """Normalized fields that are missing or out of date on `doc`."""
+    return {
+        norm_field: normalize(doc[field])
+        for field, norm_field in NORMALIZED_FIELDS.items()
+        if doc.get(field) is not None and doc.get(norm_field) != normalize(doc[field])
+    }
+
+
+def filter_clause(field: str, value: str, mode: str) -> dict:
+    if mode == "regex":
+        # Legacy free-form match on the display value; cannot use an index
+        return {field: {"$regex": value, "$options": "i"}}
+    norm_field = NORMALIZED_FIELDS[field]
+    if mode == "exact":
+        return {norm_field: normalize(value)}
+    # Anchored, case-sensitive regex on a lowercase field becomes index bounds
+    return {norm_field: {"$regex": "^" + re.escape(normalize(value))}}
+
+
+async def backfill_normalized_fields(db, batch_size: int = 1000) -> int:
+    products = db["products"]
+    missing = {"$or": [{norm_field: {"$exists": False}} for norm_field in NORMALIZED_FIELDS.values()]}
+    projection = {field: 1 for field in [*NORMALIZED_FIELDS, *NORMALIZED_FIELDS.values()]}
+
+    async def ops():
+        async for doc in products.find(missing, projection):
+            stale = stale_normalized_fields(doc)
+            if stale:
+                yield UpdateOne({"_id": doc["_id"]}, {"$set": stale})
+
+    updated = await bulk_write_batched(products, ops(), batch_size)
+    print(f"Backfilled normalized category/brand on {updated} products")
+    return updated
+
+
+class FacetDictionary:
+    """Cached list of valid category and brand values with product counts."""
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._value: Optional[dict] = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    async def _values(products_collection, field: str) -> list:
+        norm_field = NORMALIZED_FIELDS[field]
+        pipeline = [
+            {"$match": {norm_field: {"$type": "string"}}},
+            {"$group": {"_id": f"${norm_field}", "value": {"$first": f"${field}"}, "count": {"$sum": 1}}},
+            {"$sort": {"_id": 1}},
+        ]
+        return [
+            {"value": row["value"], "norm": row["_id"], "count": row["count"]}
+            async for row in products_collection.aggregate(pipeline)
+        ]
+
+    async def get(self, products_collection) -> dict:
+        if self._value is not None and time.monotonic() < self._expires_at:
+            return self._value
+        async with self._lock:
+            if self._value is None or time.monotonic() >= self._expires_at:
+                categories, brands = await asyncio.gather(
+                    self._values(products_collection, "category"),
+                    self._values(products_collection, "brand"),
+                )
+                self._value = {"categories": categories, "brands": brands}
+                self._expires_at = time.monotonic() + self.ttl_seconds
+        return self._value
+
+    def invalidate(self):
+        self._expires_at = 0.0
+
+
+facet_dictionary = FacetDictionary(ttl_seconds=settings.facet_cache_ttl_seconds)
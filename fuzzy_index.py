@@ -0,0 +1,265 @@
+# ecommerce_backend/fuzzy_index.py
+import asyncio
+import gzip
+import heapq
+import json
+import os
+import re
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+from bson import ObjectId
+from config import settings
+
+# Same fields and relative weights as the products text_search_index
+FIELD_WEIGHTS = {"name": 10, "brand": 5, "category": 3, "description": 1}
+MAX_WEIGHT = max(FIELD_WEIGHTS.values())
+SNAPSHOT_VERSION = 2
+
+# Unicode word characters, so accented and non-Latin names are indexed too
+_token_re = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _token_re.findall((text or "").lower())
+
+
+def trigrams(token: str) -> Set[str]:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Typo-tolerant token index over the searchable product fields.
+
+    Query tokens are matched against the vocabulary through shared trigrams,
+    then expanded to products through per-token postings, so a lookup only
+    touches postings that share a trigram with the query.
+    """
+
+    def __init__(self, min_similarity: float = 0.3, save_delay: float = 30.0):
+        self.min_similarity = min_similarity
+        self.save_delay = save_delay
+        self.gram_tokens: Dict[str, Set[str]] = {}
+        self.token_gram_count: Dict[str, int] = {}
+        self.postings: Dict[str, Dict[ObjectId, int]] = {}
+        self.doc_tokens: Dict[ObjectId, Dict[str, int]] = {}
+        self.max_updated_at: Optional[datetime] = None
+        self.ready = False
+        self.path: Optional[str] = None
+        self._save_timer: Optional[asyncio.TimerHandle] = None
+        self._save_task: Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return len(self.doc_tokens)
+
+    @staticmethod
+    def extract_tokens(doc: dict) -> Dict[str, int]:
+        tokens: Dict[str, int] = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            for token in tokenize(doc.get(field)):
+                if weight > tokens.get(token, 0):
+                    tokens[token] = weight
+        return tokens
+
+    def _add_tokens(self, pid: ObjectId, tokens: Dict[str, int]):
+        self.doc_tokens[pid] = tokens
+        for token, weight in tokens.items():
+            posting = self.postings.get(token)
+            if posting is None:
+                posting = self.postings[token] = {}
+                grams = trigrams(token)
+                self.token_gram_count[token] = len(grams)
+                for gram in grams:
+                    self.gram_tokens.setdefault(gram, set()).add(token)
+            posting[pid] = weight
+
+    def add_product(self, doc: dict):
+        pid = doc["_id"]
+        if pid in self.doc_tokens:
+            self.remove_product(pid)
+        self._add_tokens(pid, self.extract_tokens(doc))
+        updated_at = doc.get("updated_at")
+        if updated_at and (self.max_updated_at is None or updated_at > self.max_updated_at):
+            self.max_updated_at = updated_at
+
+    def remove_product(self, pid: ObjectId):
+        tokens = self.doc_tokens.pop(pid, None)
+        if not tokens:
+            return
+        for token in tokens:
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            posting.pop(pid, None)
+            if not posting:
+                del self.postings[token]
+                del self.token_gram_count[token]
+                for gram in trigrams(token):
+                    bucket = self.gram_tokens.get(gram)
+                    if bucket is not None:
+                        bucket.discard(token)
+                        if not bucket:
+                            del self.gram_tokens[gram]
+
+    def clear(self):
+        self.gram_tokens.clear()
+        self.token_gram_count.clear()
+        self.postings.clear()
+        self.doc_tokens.clear()
+        self.max_updated_at = None
+
+    def similar_tokens(self, token: str) -> List[Tuple[str, float]]:
+        grams = trigrams(token)
+        shared: Dict[str, int] = {}
+        for gram in grams:
+            for candidate in self.gram_tokens.get(gram, ()):
+                shared[candidate] = shared.get(candidate, 0) + 1
+
+        matches = []
+        for candidate, common in shared.items():
+            sim = common / (len(grams) + self.token_gram_count[candidate] - common)
+            # Short query tokens carry too few trigrams; treat them as prefixes
+            if candidate.startswith(token):
+                sim = max(sim, 0.5 + 0.5 * len(token) / len(candidate))
+            if sim >= self.min_similarity:
+                matches.append((candidate, sim))
+        return matches
+
+    def search(self, query: str, limit: int = 100,
+               deadline: Optional[float] = None) -> List[Tuple[ObjectId, float]]:
+        """Return up to `limit` (product_id, similarity) pairs, best first.
+
+        Raises TimeoutError once time.monotonic() passes `deadline`.
+        """
+        query_tokens = tokenize(query)
+        if not query_tokens:
+            return []
+
+        scores: Dict[ObjectId, float] = {}
+        for qt in query_tokens:
+            best: Dict[ObjectId, float] = {}
+            for token, sim in self.similar_tokens(qt):
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError("fuzzy search exceeded its budget")
+                for pid, weight in self.postings[token].items():
+                    # Field weight only nudges the order between similar matches
+                    s = sim * (1 + weight / MAX_WEIGHT) / 2
+                    if s > best.get(pid, 0):
+                        best[pid] = s
+            for pid, s in best.items():
+                scores[pid] = scores.get(pid, 0) + s
+
+        n = len(query_tokens)
+        top = heapq.nlargest(limit, scores.items(), key=lambda kv: kv[1])
+        return [(pid, s / n) for pid, s in top]
+
+    async def build(self, products_collection):
+        self.clear()
+        projection = {field: 1 for field in FIELD_WEIGHTS}
+        projection["updated_at"] = 1
+        async for doc in products_collection.find({}, projection):
+            self.add_product(doc)
+        self.ready = True
+        print(f"Built fuzzy search index over {len(self)} products")
+
+    def snapshot(self) -> dict:
+        # Token dicts are replaced, never mutated, so a shallow copy is stable
+        return {
+            "version": SNAPSHOT_VERSION,
+            "max_updated_at": self.max_updated_at.isoformat() if self.max_updated_at else None,
+            "docs": {str(pid): tokens for pid, tokens in self.doc_tokens.items()},
+        }
+
+    def save(self, path: str, snapshot: Optional[dict] = None):
+        snapshot = snapshot if snapshot is not None else self.snapshot()
+        # A temp file of its own, so concurrent savers never share one
+        with tempfile.NamedTemporaryFile(
+            dir=os.path.dirname(os.path.abspath(path)), prefix=os.path.basename(path) + ".", suffix=".tmp",
+            delete=False,
+        ) as raw:
+            tmp_path = raw.name
+            try:
+                with gzip.open(raw, "wt", encoding="utf-8") as f:
+                    json.dump(snapshot, f, separators=(",", ":"))
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        os.replace(tmp_path, path)
+
+    def load(self, path: str) -> bool:
+        if not os.path.exists(path):
+            return False
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, EOFError, ValueError) as e:
+            print(f"Ignoring unreadable fuzzy index snapshot: {e}")
+            return False
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            return False
+
+        self.clear()
+        for pid, tokens in snapshot["docs"].items():
+            self._add_tokens(ObjectId(pid), tokens)
+        if snapshot.get("max_updated_at"):
+            self.max_updated_at = datetime.fromisoformat(snapshot["max_updated_at"])
+        self.ready = True
+        return True
+
+    def schedule_save(self):
+        """Re-save the snapshot `save_delay` seconds after the first unsaved change.
+
+        The snapshot is only reused while it matches the catalog (is_stale), so
+        without this any product edit would force a full rebuild on restart.
+        """
+        if not self.ready or self.path is None or self._save_timer is not None:
+            return
+        self._save_timer = asyncio.get_running_loop().call_later(self.save_delay, self._start_save)
+
+    def _start_save(self):
+        self._save_timer = None
+        if self._save_task is not None and not self._save_task.done():
+            # Still writing the previous snapshot; pick these changes up next
+            self.schedule_save()
+            return
+        self._save_task = asyncio.get_running_loop().create_task(self._save_in_background(self.snapshot()))
+
+    async def _save_in_background(self, snapshot: dict):
+        try:
+            await asyncio.to_thread(self.save, self.path, snapshot)
+        except OSError as e:
+            print(f"Could not persist fuzzy index snapshot: {e}")
+
+    async def flush(self):
+        """Write any scheduled snapshot now (at shutdown)."""
+        if self._save_timer is not None:
+            self._save_timer.cancel()
+            self._start_save()
+        if self._save_task is not None:
+            await self._save_task
+            self._save_task = None
+
+    async def is_stale(self, products_collection) -> bool:
+        if await products_collection.estimated_document_count() != len(self):
+            return True
+        latest = await products_collection.find_one(
+            {}, {"updated_at": 1}, sort=[("updated_at", -1)]
+        )
+        latest_ts = latest.get("updated_at") if latest else None
+        return latest_ts != self.max_updated_at
+
+    async def load_or_build(self, products_collection, path: Optional[str] = None):
+        path = self.path = path or settings.fuzzy_index_path
+        if self.load(path) and not await self.is_stale(products_collection):
+            print(f"Loaded fuzzy search index snapshot ({len(self)} products)")
+            return
+        await self.build(products_collection)
+        try:
+            self.save(path)
+        except OSError as e:
+            print(f"Could not persist fuzzy index snapshot: {e}")
+
+
+fuzzy_index = TrigramIndex(save_delay=settings.fuzzy_index_save_delay_seconds)
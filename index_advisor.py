@@ -0,0 +1,246 @@
+# ecommerce_backend/index_advisor.py
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from config import settings
+from indexes import INDEX_SPEC
+from pagination import REVIEWS_SORT, USER_ORDERS_SORT
+from query_profiler import find_execution_stats, find_winning_plan, iter_plan, plan_summary, query_shape, run_explain
+from rollups import ROLLUPS_COLLECTION, top_products_pipeline
+from search import SearchQuery, search_filters
+
+# Replays query shapes through explain("executionStats") and compares the
+# plans with the indexes that exist:
+#   missing   -> a query scanned the collection, sorted in memory, or examined
+#                SLOW_QUERY_SCAN_RATIO+ documents per result; an index
+#                (equality, sort, range) is suggested from its filter and sort
+#   unused    -> no replayed query used it and $indexStats counts no accesses
+#   redundant -> its keys are a prefix of another index's keys
+# Queries come from the profiler's captured samples (GET /debug/index-advice
+# with QUERY_PROFILING=true) or from sample_workload(), which builds the
+# API's own queries with values taken from the data.
+
+RANGE_OPERATORS = {"$gt", "$gte", "$lt", "$lte", "$regex", "$ne", "$nin", "$exists"}
+
+
+def _leading_match_and_sort(kind: str, spec) -> Tuple[dict, dict]:
+    if kind != "aggregate":
+        return spec.get("filter") or {}, spec.get("sort") or {}
+    stages = list(spec)
+    match = stages[0].get("$match", {}) if stages else {}
+    rest = stages[1:] if match else stages
+    sort = rest[0].get("$sort", {}) if rest else {}
+    return match, sort
+
+
+def suggest_index(query_filter: dict, sort: dict) -> Optional[List[Tuple[str, int]]]:
+    """Key pattern for a filter and sort: equality fields, then sort, then ranges."""
+    if "$text" in query_filter:
+        return None
+    equality, ranges = [], []
+    for field, value in query_filter.items():
+        if field.startswith("$"):
+            continue
+        if isinstance(value, dict) and any(op in RANGE_OPERATORS for op in value):
+            ranges.append(field)
+        else:
+            equality.append(field)
+    keys = [(field, 1) for field in equality]
+    for field, direction in sort.items():
+        if direction in (1, -1) and field not in equality:
+            keys.append((field, direction))
+    keys.extend((field, 1) for field in ranges if field not in dict(keys))
+    return keys or None
+
+
+def analyse_explain(explain: dict) -> dict:
+    stats = find_execution_stats(explain) or {}
+    plan = find_winning_plan(explain)
+    stages = list(iter_plan(plan))
+    returned = stats.get("nReturned", 0)
+    docs_examined = stats.get("totalDocsExamined", 0)
+    return {
+        "plan": plan_summary(plan),
+        "indexes": sorted({stage["indexName"] for stage in stages if stage.get("indexName")}),
+        "collscan": any(stage.get("stage") == "COLLSCAN" for stage in stages),
+        "in_memory_sort": any(str(stage.get("stage", "")).upper() == "SORT" for stage in stages),
+        "docs_examined": docs_examined,
+        "returned": returned,
+        "scan_ratio": round(docs_examined / max(returned, 1), 1),
+    }
+
+
+def _missing_reason(analysis: dict, scan_ratio: float) -> Optional[str]:
+    if analysis["collscan"]:
+        return "collection scan"
+    if analysis["in_memory_sort"]:
+        return "in-memory sort"
+    if analysis["scan_ratio"] >= scan_ratio:
+        return f"examined {analysis['docs_examined']} docs for {analysis['returned']} returned"
+    return None
+
+
+async def _index_accesses(collection) -> Optional[Dict[str, int]]:
+    try:
+        return {
+            row["name"]: row["accesses"]["ops"]
+            async for row in collection.aggregate([{"$indexStats": {}}])
+        }
+    except Exception:
+        # Not supported (or not permitted): judge by the replayed queries only
+        return None
+
+
+def redundant_indexes(indexes: Dict[str, dict]) -> List[Tuple[str, str]]:
+    """(index, covering index) pairs where the first's keys prefix the second's."""
+    pairs = []
+    for name, info in indexes.items():
+        keys = list(info.get("key", []))
+        if name == "_id_" or info.get("unique") or info.get("partialFilterExpression") or info.get("sparse"):
+            continue
+        if any(direction not in (1, -1) for _, direction in keys):
+            continue
+        for other, other_info in indexes.items():
+            other_keys = list(other_info.get("key", []))
+            if other != name and len(other_keys) > len(keys) and other_keys[:len(keys)] == keys:
+                pairs.append((name, other))
+                break
+    return pairs
+
+
+async def advise(db, queries: List[Tuple[str, str, object]], scan_ratio: Optional[float] = None) -> dict:
+    """Report on (collection name, kind, spec) queries and the indexes they run against."""
+    scan_ratio = scan_ratio if scan_ratio is not None else settings.slow_query_scan_ratio
+    report: dict = {"queries": [], "missing": [], "unused": [], "redundant": []}
+    used = defaultdict(set)
+    suggested = set()
+    collection_names = sorted(set(INDEX_SPEC) | {name for name, _, _ in queries})
+    indexes_by_collection = {name: await db[name].index_information() for name in collection_names}
+    for collection_name, kind, spec in queries:
+        entry = {"collection": collection_name, "kind": kind, "shape": query_shape(spec)}
+        try:
+            analysis = analyse_explain(await run_explain(db[collection_name], kind, spec))
+        except Exception as e:
+            report["queries"].append({**entry, "error": str(e)})
+            continue
+        used[collection_name].update(analysis["indexes"])
+        report["queries"].append({**entry, **analysis})
+
+        reason = _missing_reason(analysis, scan_ratio)
+        if reason:
+            keys = suggest_index(*_leading_match_and_sort(kind, spec))
+            key = (collection_name, tuple(keys or ()), reason)
+            if key not in suggested:
+                suggested.add(key)
+                # An existing index starting with these keys that the planner passed over
+                existing = next((
+                    name for name, info in indexes_by_collection[collection_name].items()
+                    if keys and [tuple(k) for k in info.get("key", [])][:len(keys)] == [tuple(k) for k in keys]
+                ), None)
+                report["missing"].append({
+                    "collection": collection_name, "reason": reason, "plan": analysis["plan"],
+                    "shape": entry["shape"], "suggested_keys": keys, "existing_index": existing,
+                })
+
+    for collection_name in collection_names:
+        indexes = indexes_by_collection[collection_name]
+        accesses = await _index_accesses(db[collection_name])
+        for name, info in indexes.items():
+            if name == "_id_" or name in used[collection_name]:
+                continue
+            ops = accesses.get(name, 0) if accesses is not None else None
+            if not ops:
+                report["unused"].append({
+                    "collection": collection_name, "index": name, "keys": list(info.get("key", [])),
+                    "accesses": ops,
+                })
+        for name, covering in redundant_indexes(indexes):
+            report["redundant"].append({"collection": collection_name, "index": name, "covered_by": covering})
+    return report
+
+
+async def sample_workload(db) -> List[Tuple[str, str, object]]:
+    """The API's main queries, with values picked from the current data."""
+    queries: List[Tuple[str, str, object]] = []
+    review = await db["reviews"].find_one({}, {"product_id": 1})
+    if review:
+        queries.append(("reviews", "find", {
+            "filter": {"product_id": review["product_id"]}, "sort": dict(REVIEWS_SORT), "limit": 20,
+        }))
+    order = await db["orders"].find_one({}, {"user_id": 1})
+    if order:
+        queries.append(("orders", "find", {"filter": {"user_id": order["user_id"]}, "sort": dict(USER_ORDERS_SORT)}))
+    product = await db["products"].find_one({}, {"name": 1, "category": 1, "price": 1})
+    category = None
+    if product:
+        category = product.get("category")
+        price = product.get("price") or 0
+        term = ((product.get("name") or "").split() or [""])[0]
+        filters = search_filters(None, price, category, None, "prefix")
+        search = SearchQuery(term, filters, None, limit=20)
+        queries.append(("products", "aggregate", search.text_candidate_pipeline()))
+        # The category/price part of a search, on its own
+        queries.append(("products", "find", {"filter": filters, "sort": {"price": 1}, "limit": 20}))
+    since = datetime.utcnow() - timedelta(days=30)
+    queries.append((ROLLUPS_COLLECTION, "aggregate", top_products_pipeline(since)))
+    if category:
+        queries.append((ROLLUPS_COLLECTION, "aggregate", top_products_pipeline(since, category)))
+    return queries
+
+
+def print_report(report: dict):
+    print("\nQueries")
+    for query in report["queries"]:
+        label = f"  {query['collection']} {query['kind']}"
+        if "error" in query:
+            print(f"{label}: explain failed: {query['error']}")
+        else:
+            print(f"{label}: {query['plan']} ({query['docs_examined']} examined / {query['returned']} returned)")
+    print("\nMissing indexes")
+    for item in report["missing"] or [None]:
+        if item is None:
+            print("  none")
+            continue
+        keys = ", ".join(f"{field}: {direction}" for field, direction in item["suggested_keys"] or [])
+        if not keys:
+            advice = "no index can serve this filter"
+        elif item["existing_index"]:
+            advice = f"{item['existing_index']} covers {{{keys}}} but was not chosen"
+        else:
+            advice = f"suggest {{{keys}}}"
+        print(f"  {item['collection']}: {item['reason']}; {advice}")
+    print("\nUnused indexes")
+    for item in report["unused"] or [None]:
+        print("  none" if item is None else f"  {item['collection']}.{item['index']} (accesses: {item['accesses']})")
+    print("\nRedundant indexes")
+    for item in report["redundant"] or [None]:
+        print("  none" if item is None else f"  {item['collection']}.{item['index']} is a prefix of {item['covered_by']}")
+
+
+async def _run_advisor(db, queries_file: Optional[str] = None, as_json: bool = False):
+    import json
+    from bson import json_util
+
+    if queries_file:
+        with open(queries_file) as f:
+            queries = [tuple(entry) for entry in json_util.loads(f.read())]
+    else:
+        queries = await sample_workload(db)
+    report = await advise(db, queries)
+    if as_json:
+        print(json.dumps(report, indent=2, default=str))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    import argparse
+    from bulk_writes import run_with_database
+
+    parser = argparse.ArgumentParser(description="Replay query shapes through explain and report index problems")
+    parser.add_argument("--queries", help="Extended-JSON file of [collection, kind, spec] entries to replay "
+                                          "instead of the built-in workload")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    run_with_database(lambda db: _run_advisor(db, args.queries, args.json))
@@ -0,0 +1,94 @@
+# ecommerce_backend/indexes.py
+import asyncio
+from typing import Dict, List
+from pymongo import IndexModel
+from rollups import ROLLUPS_COLLECTION
+
+# Declarative index catalog: collection -> index definitions. ensure_indexes()
+# reconciles every collection concurrently against this spec. An index counts
+# as present if one with the same name or the same key pattern exists.
+# Compound keys follow equality, sort, range: the equality field first, then
+# the sort (with _id as the keyset tie-breaker), then any range field.
+INDEX_SPEC: Dict[str, List[dict]] = {
+    "products": [
+        {
+            "name": "text_search_index",
+            "keys": [("name", "text"), ("description", "text"), ("brand", "text"), ("category", "text")],
+            "weights": {"name": 10, "brand": 5, "category": 3, "description": 1},
+        },
+        {"name": "rating_index", "keys": [("rating.average", -1)]},
+        {"name": "brand_index", "keys": [("brand", 1)]},
+        {"name": "popularity_index", "keys": [("popularity", -1)]},
+        {"name": "category_norm_price_index", "keys": [("category_norm", 1), ("price", 1)]},
+        {"name": "brand_norm_price_index", "keys": [("brand_norm", 1), ("price", 1)]},
+    ],
+    "orders": [
+        # get_user_orders: user_id equality, newest first
+        {"name": "user_id_timestamp_index", "keys": [("user_id", 1), ("timestamp", -1), ("_id", -1)]},
+        {"name": "timestamp_index", "keys": [("timestamp", -1)]},
+        {"name": "order_products_product_id_idx", "keys": [("products.product_id", 1)]},
+    ],
+    "reviews": [
+        # get_product_reviews: product_id equality, newest first
+        {"name": "product_id_timestamp_index", "keys": [("product_id", 1), ("timestamp", -1), ("_id", -1)]},
+        {"name": "user_id_review_index", "keys": [("user_id", 1)]},
+    ],
+    "users": [
+        {"name": "email_index", "keys": [("email", 1)], "unique": True},
+    ],
+    ROLLUPS_COLLECTION: [
+        {"name": "day_product_index", "keys": [("day", 1), ("product_id", 1)]},
+        {"name": "category_day_index", "keys": [("category", 1), ("day", 1)]},
+    ],
+}
+
+# Indexes replaced by the catalog above, or with no reader left; dropped at startup
+RETIRED_INDEXES: Dict[str, List[str]] = {
+    # (price, category) cannot seek on category equality plus a price range, and
+    # (category, price) has no reader since filters match category_norm
+    # static_score is only read inside the computed hybrid_score, never sorted on
+    "products": ["price_category_index", "category_price_index", "static_score_index"],
+    # Prefixes of the (…, timestamp, _id) compounds, which also cover the sort
+    "orders": ["user_id_index"],
+    "reviews": ["product_id_index"],
+}
+
+
+def _key_pattern(keys) -> list:
+    # Text indexes report their key as _fts/_ftsx rather than the field list
+    if any(direction == "text" for _, direction in keys):
+        return [("_fts", "text"), ("_ftsx", 1)]
+    return [(field, direction) for field, direction in keys]
+
+
+def index_model(spec: dict) -> IndexModel:
+    options = {k: v for k, v in spec.items() if k != "keys"}
+    return IndexModel(spec["keys"], **options)
+
+
+async def ensure_collection_indexes(collection, specs: List[dict], retired: List[str] = ()) -> List[str]:
+    existing = await collection.index_information()
+    existing_keys = [list(info.get("key", [])) for info in existing.values()]
+    missing = [
+        spec for spec in specs
+        if spec["name"] not in existing and _key_pattern(spec["keys"]) not in existing_keys
+    ]
+    if missing:
+        # One createIndexes command per collection instead of one per index
+        await collection.create_indexes([index_model(spec) for spec in missing])
+    for spec in missing:
+        print(f"✓ Created index {collection.name}.{spec['name']}")
+    for name in retired:
+        if name in existing:
+            await collection.drop_index(name)
+            print(f"✓ Dropped retired index {collection.name}.{name}")
+    return [spec["name"] for spec in missing]
+
+
+async def ensure_indexes(db, spec: Dict[str, List[dict]] = INDEX_SPEC,
+                         retired: Dict[str, List[str]] = RETIRED_INDEXES) -> Dict[str, List[str]]:
+    names = list(spec)
+    created = await asyncio.gather(*(
+        ensure_collection_indexes(db[name], spec[name], retired.get(name, [])) for name in names
+    ))
+    return dict(zip(names, created))
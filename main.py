@@ -1,13 +1,39 @@
-from fastapi import FastAPI, HTTPException, Query, Depends, Path
+from fastapi import FastAPI, HTTPException, Query, Depends, Path, Response, BackgroundTasks
+from fastapi.responses import JSONResponse, PlainTextResponse
 from typing import List, Optional
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime, timedelta
 from bson import ObjectId
-from database import mongo_db, init_db, get_database
+from database import init_db, close_db, get_database, get_collection, startup_state
+from config import settings
+from search_cache import Computed, search_cache
+from facets import FILTER_MODES, facet_dictionary
+from search import SearchQuery, normalize_sort, price_facets, search_filters, value_facets
+from product_cache import product_cache
+from pool_monitor import pool_monitor
+from query_profiler import query_profiler
+from index_advisor import advise, sample_workload
+from metrics import PROMETHEUS_CONTENT_TYPE, record_exception, render_metrics, span, TimingMiddleware
+from rollups import ROLLUPS_COLLECTION, top_products_pipeline, top_k_per_category
+from enrichment import distinct_product_ids, enhance_orders
+from streaming import stream_format, streaming_response, iter_batches
+from serialization import build_item, render
+from batch import batch_entries, fetch_by_ids, iter_batch_entries, model_projection, parse_ids
+from order_ingest import CREATED, OrderRejected, from_request, order_writer
+from ratings import HISTOGRAM_FIELD, empty_histogram, record_review
+from reviewers import USER_PROJECTION, fan_out_reviewer_snapshot, reviewer_snapshot
+from pagination import (
+    NEXT_CURSOR_HEADER, USER_ORDERS_SORT, REVIEWS_SORT, InvalidCursor, decode_cursor, seek_filter, next_cursor
+)
 from models import (
-    ProductInDB, SearchProductResponse, 
-    OrderResponse, OrderInDB, EnhancedOrderResponse,
+    SearchProductResponse, FacetedSearchResponse,
+    OrderResponse, EnhancedOrderResponse,
     ReviewWithUser, UserResponse,
-    TopProductResponse
+    TopProductResponse,
+    ProductInDB, BatchRequest, ProductBatchEntry, OrderBatchEntry, UserBatchEntry,
+    OrderCreate, BulkOrderRequest, OrderCreateResult,
+    ReviewInDB, ReviewCreate, RatingSummary, UserUpdate
 )
 
 app = FastAPI(
@@ -16,18 +42,25 @@ app = FastAPI(
     version="1.0.0"
 )
 
+app.add_middleware(TimingMiddleware)
+
 @app.get("/")
 def home():
     return {"message": "E-commerce backend is running successfully!"}
 
+@app.get("/health")
+def health():
+    # 503 until background startup (indexes, seed data, caches) has finished
+    status_code = 200 if startup_state.ready else 503
+    return JSONResponse(status_code=status_code, content=startup_state.snapshot())
+
 @app.on_event("startup")
 async def startup_db_client():
     await init_db()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    mongo_db.client.close()
-    print("MongoDB connection closed.")
+    await close_db()
 
 def get_products_collection():
     db = get_database()
@@ -45,161 +78,175 @@ def get_reviews_collection():
     db = get_database()
     return db["reviews"]
 
+def read_collection(name: str, policy: str):
+    """Dependency for a collection routed by one of settings.read_policies."""
+    def dependency():
+        return get_collection(name, policy)
+    return dependency
+
+REVIEW_PROJECTION = {
+    "_id": 1, "user_id": 1, "product_id": 1, "rating": 1, "review_text": 1, "timestamp": 1,
+    "user_name": 1, "user_email": 1,
+}
+# Orders enriched per round-trip when streaming
+STREAM_BATCH_SIZE = 200
+
+@app.get("/products/facets")
+async def get_product_facets(products_collection=Depends(get_products_collection)):
+    """Valid category and brand values (with product counts) for search filters."""
+    try:
+        return await facet_dictionary.get(products_collection)
+    except Exception as e:
+        record_exception(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/products/search", response_model=List[SearchProductResponse])
 async def search_products(
+    response: Response,
     query: str = Query(..., min_length=1),
     min_price: Optional[float] = Query(None, ge=0),
     max_price: Optional[float] = Query(None, ge=0),
     category: Optional[str] = None,
     brand: Optional[str] = None,
+    filter_mode: str = Query(
+        "regex", pattern=f"^({'|'.join(FILTER_MODES)})$",
+        description="How category/brand match: regex (substring, case-insensitive), or the indexed exact or prefix"
+    ),
     limit: int = Query(10, ge=1, le=100),
     skip: int = Query(0, ge=0),
     sort_by: Optional[str] = None,
-    products_collection=Depends(get_products_collection),
-    orders_collection=Depends(get_orders_collection)
+    cursor: Optional[str] = Query(None, description=f"Continuation token from the {NEXT_CURSOR_HEADER} header; replaces skip"),
+    fmt: Optional[str] = Depends(stream_format),
+    products_collection=Depends(read_collection("products", "search"))
 ):
     try:
-        normalized_sort = None
-        if sort_by:
-            s = str(sort_by).strip().lower().replace('-', ' ').replace('_', ' ')
-            if s in {"hybrid", "hybrid search", "hybridscore", "hybrid score"}:
-                normalized_sort = None
+        sort = normalize_sort(sort_by)
+        q = (query or "").strip()
+        filters = search_filters(min_price, max_price, category, brand, filter_mode)
+        try:
+            search = SearchQuery(q, filters, sort, limit, skip, cursor)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        async def execute_search():
+            timed_out = False
+            if not search.uses_candidates():
+                with span("db"):
+                    phase, docs = await search.sorted_page(products_collection)
             else:
-                if s in {"price asc", "price low", "price low to high", "price_asc"}:
-                    normalized_sort = "price_asc"
-                elif s in {"price desc", "price high", "price high to low", "price_desc"}:
-                    normalized_sort = "price_desc"
-                elif s in {"popularity", "popular"}:
-                    normalized_sort = "popularity"
-                elif s in {"rating", "ratings"}:
-                    normalized_sort = "rating"
-                else:
-                    normalized_sort = None
-        sort_by_effective = normalized_sort
+                with span("candidates"):
+                    phase, candidates, timed_out = await search.candidates(products_collection)
+                docs = []
+                if candidates:
+                    pipeline = search.enrich_pipeline(candidates)
+                    with span("db"), query_profiler.track(products_collection, "aggregate", pipeline):
+                        docs = [doc async for doc in products_collection.aggregate(pipeline)]
+            docs, token = search.page(docs, phase)
+            with span("build"):
+                result = [build_item(doc, SearchProductResponse) for doc in docs], token
+            # A pass cut short by its budget is answered once, not cached
+            return Computed(result, [doc["_id"] for doc in docs], store=not timed_out)
+
+        results, token = await search_cache.get_or_compute(
+            search_cache_key(q, min_price, max_price, category, brand, filter_mode, limit, skip, cursor, sort),
+            execute_search,
+        )
+        if fmt:
+            return streaming_response(results, fmt)
+        if token:
+            response.headers[NEXT_CURSOR_HEADER] = token
+        return render(results, response)
+    except HTTPException:
+        raise
+    except Exception as e:
+        record_exception(e)
+        raise HTTPException(status_code=500, detail=str(e))
 
+
+@app.get("/products/search/faceted", response_model=FacetedSearchResponse)
+async def search_products_faceted(
+    response: Response,
+    query: str = Query(..., min_length=1),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    category: Optional[str] = None,
+    brand: Optional[str] = None,
+    filter_mode: str = Query("regex", pattern=f"^({'|'.join(FILTER_MODES)})$"),
+    limit: int = Query(10, ge=1, le=100),
+    skip: int = Query(0, ge=0),
+    sort_by: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description=f"Continuation token from the {NEXT_CURSOR_HEADER} header; replaces skip"),
+    products_collection=Depends(read_collection("products", "search"))
+):
+    """Ranked page plus category/brand/price-bucket counts from a single $facet pass."""
+    try:
+        sort = normalize_sort(sort_by)
         q = (query or "").strip()
-        fuzzy_query = ".*" + ".*".join(list(q.lower())) + ".*"
-
-        filters: dict = {}
-        if min_price is not None:
-            filters["price"] = {"$gte": min_price}
-        if max_price is not None:
-            filters.setdefault("price", {})["$lte"] = max_price
-        if category:
-            filters["category"] = {"$regex": category, "$options": "i"}
-        if brand:
-            filters["brand"] = {"$regex": brand, "$options": "i"}
-
-        def build_sort_stage():
-            sort_map = {
-                "price_asc": {"price": 1},
-                "price_desc": {"price": -1},
-                "popularity": {"popularity": -1},
-                "rating": {"rating.average": -1},
-            }
-            return {"$sort": sort_map.get(sort_by_effective, {"hybrid_score": -1})}
-
-        need_popularity = (not sort_by_effective) or (sort_by_effective == "popularity")
-
-        def compose_pipeline(match_stage: Optional[dict] = None, use_text_score: bool = False, pre_stages: Optional[List[dict]] = None):
-            pipe: List[dict] = []
-            if pre_stages:
-                pipe.extend(pre_stages)
-            if match_stage is not None:
-                pipe.append({"$match": match_stage})
-            if need_popularity:
-                pipe.append({
-                    "$lookup": {
-                        "from": "orders",
-                        "let": {"pid": "$_id"},
-                        "pipeline": [
-                            {"$match": {"$expr": {"$in": ["$$pid", "$products.product_id"]}}},
-                            {"$group": {"_id": 1, "c": {"$sum": 1}}}
-                        ],
-                        "as": "pop"
-                    }
-                })
-                pipe.append({
-                    "$addFields": {
-                        "popularity": {"$ifNull": [{"$arrayElemAt": ["$pop.c", 0]}, 0]}
+        filters = search_filters(min_price, max_price, category, brand, filter_mode)
+        try:
+            search = SearchQuery(q, filters, sort, limit, skip, cursor)
+        except InvalidCursor as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        boundaries = settings.search_price_buckets
+
+        async def execute_faceted_search():
+            for phase, match, relevance in search.phases():
+                pipeline = search.faceted_pipeline(match, relevance, boundaries)
+                with span("db"), query_profiler.track(products_collection, "aggregate", pipeline):
+                    result = await products_collection.aggregate(pipeline).to_list(length=1)
+                facets = result[0] if result else {}
+                total = facets.get("total") or [{"count": 0}]
+                if not total[0]["count"]:
+                    continue
+                docs, token = search.page(facets["items"], phase)
+                with span("build"):
+                    content = {
+                        "items": [build_item(doc, SearchProductResponse) for doc in docs],
+                        "total": total[0]["count"],
+                        "facets": {
+                            "category": value_facets(facets["category"]),
+                            "brand": value_facets(facets["brand"]),
+                            "price": price_facets(facets["price"], boundaries),
+                        },
                     }
-                })
-            if not sort_by_effective:
-                if use_text_score:
-                    pipe.append({
-                        "$addFields": {
-                            "text_score": {"$meta": "textScore"},
-                            "hybrid_score": {
-                                "$add": [
-                                    {"$multiply": [0.4, {"$meta": "textScore"}]},
-                                    {"$multiply": [0.4, {"$min": [1, {"$divide": ["$popularity", 100]}]}]},
-                                    {"$multiply": [0.2, {"$cond": [{"$gt": ["$price", 0]}, {"$divide": [1, "$price"]}, 0]}]}
-                                ]
-                            }
-                        }
-                    })
-                else:
-                    pipe.append({
-                        "$addFields": {
-                            "hybrid_score": {
-                                "$add": [
-                                    {"$multiply": [0.4, {"$min": [1, {"$divide": ["$popularity", 100]}]}]},
-                                    {"$multiply": [0.2, {"$cond": [{"$gt": ["$price", 0]}, {"$divide": [1, "$price"]}, 0]}]}
-                                ]
-                            }
-                        }
-                    })
-                pipe.append({"$sort": {"hybrid_score": -1}})
-            else:
-                pipe.append(build_sort_stage())
-
-            pipe.extend([{"$skip": skip}, {"$limit": limit}])
-            pipe.append({
-                "$project": {
-                    "_id": 1, "name": 1, "description": 1, "category": 1,
-                    "price": 1, "brand": 1, "rating": 1, "stock": 1,
-                    "created_at": 1, "updated_at": 1,
-                    "score": {"$ifNull": ["$hybrid_score", 0]}
-                }
-            })
-            return pipe
-
-        results: List[ProductInDB] = []
-
-        used_text = False
-        if len(q) >= 3:
-            text_match = {"$text": {"$search": q}}
-            text_match.update(filters)
-            text_pipeline = compose_pipeline(text_match, use_text_score=True)
-            cursor = products_collection.aggregate(text_pipeline)
-            results = [ProductInDB(**doc) async for doc in cursor]
-            used_text = True
-
-        if not results:
-            regex_match = {
-                "$or": [
-                    {"name": {"$regex": fuzzy_query, "$options": "i"}},
-                    {"description": {"$regex": fuzzy_query, "$options": "i"}},
-                    {"brand": {"$regex": fuzzy_query, "$options": "i"}},
-                    {"category": {"$regex": fuzzy_query, "$options": "i"}},
-                ]
-            }
-            if filters:
-                pre_stages = [{"$match": filters}, {"$match": regex_match}]
-                regex_pipeline = compose_pipeline(match_stage=None, use_text_score=False, pre_stages=pre_stages)
-            else:
-                regex_pipeline = compose_pipeline(regex_match, use_text_score=False)
-            cursor = products_collection.aggregate(regex_pipeline)
-            results = [ProductInDB(**doc) async for doc in cursor]
+                return Computed((content, token), [doc["_id"] for doc in docs])
+            return {"items": [], "total": 0, "facets": {"category": [], "brand": [], "price": []}}, None
 
-        return results
+        key = ("faceted",) + search_cache_key(q, min_price, max_price, category, brand, filter_mode, limit, skip, cursor, sort)
+        content, token = await search_cache.get_or_compute(key, execute_faceted_search)
+        if token:
+            response.headers[NEXT_CURSOR_HEADER] = token
+        return render(content, response)
+    except HTTPException:
+        raise
     except Exception as e:
+        record_exception(e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def search_cache_key(q, min_price, max_price, category, brand, filter_mode, limit, skip, cursor, sort) -> tuple:
+    if filter_mode != "regex":
+        # Normalized matches ignore case; regex patterns do not (\S is not \s)
+        category, brand = (category or "").lower(), (brand or "").lower()
+    return (
+        " ".join(q.lower().split()), min_price, max_price,
+        category or "", brand or "", filter_mode,
+        limit, skip if cursor is None else cursor, sort,
+    )
+
+
+def _rating_sorted(key: tuple) -> bool:
+    # search_cache_key() ends with the sort
+    return key[-1] == "rating"
+
+
 @app.get("/users/{user_id}/orders", response_model=List[EnhancedOrderResponse])
 async def get_user_orders(
+    response: Response,
     user_id: str = Path(..., description="User ID"),
+    limit: Optional[int] = Query(None, ge=1, le=100, description="Page size; all orders when omitted"),
+    cursor: Optional[str] = Query(None, description=f"Continuation token from the {NEXT_CURSOR_HEADER} header"),
+    fmt: Optional[str] = Depends(stream_format),
     users_collection=Depends(get_users_collection),
     orders_collection=Depends(get_orders_collection),
     products_collection=Depends(get_products_collection)
@@ -209,76 +256,110 @@ async def get_user_orders(
             raise HTTPException(status_code=400, detail="Invalid user ID format")
         
         user_obj_id = ObjectId(user_id)
-        user = await users_collection.find_one({"_id": user_obj_id})
+        with span("db"):
+            user = await users_collection.find_one({"_id": user_obj_id})
         if not user:
             raise HTTPException(status_code=404, detail="User not found")
-        
-        pipeline = [
-            {"$match": {"user_id": user_obj_id}},
-            {"$sort": {"timestamp": -1}},
-            {
-                "$lookup": {
-                    "from": "users",
-                    "localField": "user_id",
-                    "foreignField": "_id",
-                    "as": "user_info"
-                }
-            },
-            {"$unwind": {"path": "$user_info", "preserveNullAndEmptyArrays": True}},
-            {"$unwind": {"path": "$products", "preserveNullAndEmptyArrays": True}},
-            {
-                "$lookup": {
-                    "from": "products",
-                    "localField": "products.product_id",
-                    "foreignField": "_id",
-                    "as": "product_info"
-                }
-            },
-            {"$unwind": {"path": "$product_info", "preserveNullAndEmptyArrays": True}},
-            {
-                "$group": {
-                    "_id": "$_id",
-                    "user_id": {"$first": "$user_id"},
-                    "user_name": {"$first": "$user_info.name"},
-                    "user_email": {"$first": "$user_info.email"},
-                    "user_location": {"$first": "$user_info.location"},
-                    "total_cost": {"$first": "$total_cost"},
-                    "status": {"$first": "$status"},
-                    "timestamp": {"$first": "$timestamp"},
-                    "products": {
-                        "$push": {
-                            "product_id": "$products.product_id",
-                            "name": "$products.name",
-                            "price_at_purchase": "$products.price_at_purchase",
-                            "quantity": "$products.quantity",
-                            "description": "$product_info.description",
-                            "category": "$product_info.category",
-                            "brand": "$product_info.brand",
-                            "current_price": "$product_info.price"
-                        }
-                    }
-                }
-            },
-            {"$sort": {"timestamp": -1}}
-        ]
-        
-        cursor = orders_collection.aggregate(pipeline)
-        orders = []
-        async for order in cursor:
-            orders.append(EnhancedOrderResponse(**order))
-        
-        return orders
+
+        order_match: dict = {"user_id": user_obj_id}
+        if cursor:
+            try:
+                order_match.update(seek_filter(USER_ORDERS_SORT, decode_cursor(cursor, "user_orders", len(USER_ORDERS_SORT))))
+            except InvalidCursor as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        # The user is already in hand and products come from the catalog cache
+        # (one batched $in for misses), so cost follows distinct products
+        # rather than order lines
+        orders_cursor = orders_collection.find(order_match).sort(USER_ORDERS_SORT)
+        if limit:
+            orders_cursor = orders_cursor.limit(limit)
+
+        if fmt:
+            async def stream_orders():
+                # Enrich one cursor batch at a time so memory stays bounded
+                async for batch in iter_batches(orders_cursor, STREAM_BATCH_SIZE):
+                    products_by_id = await product_cache.get_many(products_collection, distinct_product_ids(batch))
+                    for order in enhance_orders(batch, user, products_by_id):
+                        yield build_item(order, EnhancedOrderResponse)
+            return streaming_response(stream_orders(), fmt)
+
+        with span("db"):
+            order_query = {"filter": order_match, "sort": dict(USER_ORDERS_SORT), **({"limit": limit} if limit else {})}
+            with query_profiler.track(orders_collection, "find", order_query):
+                raw_orders = await orders_cursor.to_list(length=None)
+            products_by_id = await product_cache.get_many(products_collection, distinct_product_ids(raw_orders))
+        with span("build"):
+            orders = [build_item(order, EnhancedOrderResponse) for order in enhance_orders(raw_orders, user, products_by_id)]
+
+        token = next_cursor("user_orders", raw_orders, limit, USER_ORDERS_SORT)
+        if token:
+            response.headers[NEXT_CURSOR_HEADER] = token
+        return render(orders, response)
     except HTTPException:
         raise
     except Exception as e:
+        record_exception(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _fan_out_reviewer_snapshot(user: dict):
+    try:
+        updated = await fan_out_reviewer_snapshot(get_database(), user)
+        print(f"Updated reviewer snapshot of user {user['_id']} on {updated} reviews")
+    except Exception as e:
+        # The next change to this user fans out again; the snapshot is complete
+        print(f"Reviewer snapshot fan-out for user {user['_id']} failed: {e}")
+
+
+@app.patch("/users/{user_id}", response_model=UserResponse)
+async def update_user(
+    update: UserUpdate,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    user_id: str = Path(..., description="User ID"),
+    users_collection=Depends(get_users_collection)
+):
+    try:
+        if not ObjectId.is_valid(user_id):
+            raise HTTPException(status_code=400, detail="Invalid user ID format")
+
+        changes = update.model_dump(exclude_unset=True)
+        if not changes:
+            raise HTTPException(status_code=400, detail="No fields to update")
+        changes["updated_at"] = datetime.utcnow()
+        with span("db"):
+            try:
+                user = await users_collection.find_one_and_update(
+                    {"_id": ObjectId(user_id)}, {"$set": changes}, return_document=ReturnDocument.AFTER
+                )
+            except DuplicateKeyError:
+                raise HTTPException(status_code=409, detail="Email already in use")
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+
+        # Reviews embed name/email; patch them after the response is sent
+        if "name" in changes or "email" in changes:
+            background_tasks.add_task(_fan_out_reviewer_snapshot, user)
+
+        with span("build"):
+            item = build_item(user, UserResponse)
+        return render(item, response)
+    except HTTPException:
+        raise
+    except Exception as e:
+        record_exception(e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/products/{product_id}/reviews", response_model=List[ReviewWithUser])
 async def get_product_reviews(
+    response: Response,
     product_id: str = Path(..., description="Product ID"),
     limit: int = Query(20, ge=1, le=100),
     skip: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description=f"Continuation token from the {NEXT_CURSOR_HEADER} header; replaces skip"),
+    fmt: Optional[str] = Depends(stream_format),
     products_collection=Depends(get_products_collection),
     reviews_collection=Depends(get_reviews_collection)
 ):
@@ -287,123 +368,349 @@ async def get_product_reviews(
             raise HTTPException(status_code=400, detail="Invalid product ID format")
         
         product_obj_id = ObjectId(product_id)
-        product = await products_collection.find_one({"_id": product_obj_id})
+        review_match: dict = {"product_id": product_obj_id}
+        if cursor:
+            try:
+                review_match.update(seek_filter(REVIEWS_SORT, decode_cursor(cursor, "reviews", len(REVIEWS_SORT))))
+            except InvalidCursor as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        # Reviews embed their author's name/email, so the page is one query
+        reviews_cursor = reviews_collection.find(review_match, REVIEW_PROJECTION).sort(REVIEWS_SORT)
+        if not cursor:
+            reviews_cursor = reviews_cursor.skip(skip)
+        reviews_cursor = reviews_cursor.limit(limit)
+
+        if fmt:
+            with span("db"):
+                product_exists = await product_cache.exists(products_collection, product_obj_id)
+            if not product_exists:
+                raise HTTPException(status_code=404, detail="Product not found")
+
+            async def stream_reviews():
+                async for review in reviews_cursor:
+                    yield build_item(review, ReviewWithUser)
+            return streaming_response(stream_reviews(), fmt)
+
+        with span("db"):
+            review_query = {"filter": review_match, "sort": dict(REVIEWS_SORT), **({} if cursor else {"skip": skip}), "limit": limit}
+            with query_profiler.track(reviews_collection, "find", review_query):
+                raw_reviews = await reviews_cursor.to_list(length=None)
+            # Any review proves the product exists; only an empty page needs
+            # the (cached) existence check to tell "no reviews" from 404
+            if not raw_reviews and not await product_cache.exists(products_collection, product_obj_id):
+                raise HTTPException(status_code=404, detail="Product not found")
+        with span("build"):
+            reviews = [build_item(review, ReviewWithUser) for review in raw_reviews]
+
+        token = next_cursor("reviews", raw_reviews, limit, REVIEWS_SORT)
+        if token:
+            response.headers[NEXT_CURSOR_HEADER] = token
+        return render(reviews, response)
+    except HTTPException:
+        raise
+    except Exception as e:
+        record_exception(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/products/{product_id}/reviews", response_model=ReviewInDB, status_code=201)
+async def create_product_review(
+    review: ReviewCreate,
+    response: Response,
+    product_id: str = Path(..., description="Product ID"),
+    products_collection=Depends(get_products_collection),
+    users_collection=Depends(get_users_collection),
+    reviews_collection=Depends(get_reviews_collection)
+):
+    try:
+        if not ObjectId.is_valid(product_id):
+            raise HTTPException(status_code=400, detail="Invalid product ID format")
+
+        product_obj_id = ObjectId(product_id)
+        with span("db"):
+            if not await product_cache.exists(products_collection, product_obj_id):
+                raise HTTPException(status_code=404, detail="Product not found")
+            user = await users_collection.find_one({"_id": review.user_id}, USER_PROJECTION)
+            if not user:
+                raise HTTPException(status_code=404, detail="User not found")
+
+            doc = {
+                "_id": ObjectId(),
+                "user_id": review.user_id,
+                "product_id": product_obj_id,
+                "rating": review.rating,
+                "review_text": review.review_text,
+                "timestamp": datetime.utcnow(),
+                **reviewer_snapshot(user),
+            }
+            await reviews_collection.insert_one(doc)
+            # A failure here leaves the aggregates one review short until
+            # the next `python ratings.py`
+            await record_review(get_database(), product_obj_id, review.rating)
+            search_cache.evict_products([product_obj_id], where=_rating_sorted)
+
+        with span("build"):
+            item = build_item(doc, ReviewInDB)
+        response.status_code = 201
+        return render(item, response)
+    except HTTPException:
+        raise
+    except Exception as e:
+        record_exception(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/products/{product_id}/reviews/summary", response_model=RatingSummary)
+async def get_product_review_summary(
+    response: Response,
+    product_id: str = Path(..., description="Product ID"),
+    products_collection=Depends(get_products_collection)
+):
+    """Rating average, count and per-star histogram, precomputed on the product."""
+    try:
+        if not ObjectId.is_valid(product_id):
+            raise HTTPException(status_code=400, detail="Invalid product ID format")
+
+        product_obj_id = ObjectId(product_id)
+        with span("db"):
+            product = await products_collection.find_one({"_id": product_obj_id}, {"rating": 1, HISTOGRAM_FIELD: 1})
         if not product:
             raise HTTPException(status_code=404, detail="Product not found")
-        
-        pipeline = [
-            {"$match": {"product_id": product_obj_id}},
-            {"$sort": {"timestamp": -1}},
-            {"$skip": skip},
-            {"$limit": limit},
-            {
-                "$lookup": {
-                    "from": "users",
-                    "localField": "user_id",
-                    "foreignField": "_id",
-                    "as": "user_info"
-                }
-            },
-            {
-                "$addFields": {
-                    "user_name": {"$arrayElemAt": ["$user_info.name", 0]},
-                    "user_email": {"$arrayElemAt": ["$user_info.email", 0]}
-                }
-            },
-            {
-                "$project": {
-                    "_id": 1,
-                    "user_id": 1,
-                    "product_id": 1,
-                    "rating": 1,
-                    "review_text": 1,
-                    "timestamp": 1,
-                    "user_name": 1,
-                    "user_email": 1
-                }
-            }
-        ]
-        
-        cursor = reviews_collection.aggregate(pipeline)
-        reviews = []
-        async for review in cursor:
-            reviews.append(ReviewWithUser(**review))
-        
-        return reviews
+
+        rating = product.get("rating") or {}
+        summary = {
+            "product_id": product_obj_id,
+            "average": rating.get("average", 0),
+            "count": rating.get("count", 0),
+            "histogram": {**empty_histogram(), **(product.get(HISTOGRAM_FIELD) or {})},
+        }
+        with span("build"):
+            item = build_item(summary, RatingSummary)
+        return render(item, response)
     except HTTPException:
         raise
     except Exception as e:
+        record_exception(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# Rejection status -> HTTP status for single-order creation
+ORDER_REJECTION_STATUS = {"user_not_found": 404, "product_not_found": 404, "insufficient_stock": 409}
+
+
+@app.post("/orders", response_model=OrderResponse, status_code=201)
+async def create_order(order: OrderCreate, response: Response):
+    try:
+        with span("db"):
+            (result,) = await order_writer.submit(get_database(), [from_request(order)])
+        if isinstance(result, OrderRejected):
+            raise HTTPException(status_code=ORDER_REJECTION_STATUS[result.status], detail=result.detail)
+        with span("build"):
+            item = build_item(result, OrderResponse)
+        response.status_code = 201
+        return render(item, response)
+    except HTTPException:
+        raise
+    except Exception as e:
+        record_exception(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/orders/bulk", response_model=List[OrderCreateResult])
+async def create_orders_bulk(request: BulkOrderRequest, response: Response):
+    """One result per submitted order, in order; rejected orders do not fail the others."""
+    try:
+        with span("db"):
+            results = await order_writer.submit(get_database(), [from_request(order) for order in request.orders])
+        with span("build"):
+            items = [
+                {"status": result.status, "order": None, "detail": result.detail}
+                if isinstance(result, OrderRejected)
+                else {"status": CREATED, "order": build_item(result, OrderResponse), "detail": None}
+                for result in results
+            ]
+        return render(items, response)
+    except HTTPException:
+        raise
+    except Exception as e:
+        record_exception(e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/orders/{order_id}", response_model=OrderResponse)
 async def get_order(
+    response: Response,
     order_id: str = Path(..., description="Order ID"),
-    orders_collection=Depends(get_orders_collection)
+    orders_collection=Depends(read_collection("orders", "order_detail"))
 ):
     try:
         if not ObjectId.is_valid(order_id):
             raise HTTPException(status_code=400, detail="Invalid order ID format")
         
         order_obj_id = ObjectId(order_id)
-        order = await orders_collection.find_one({"_id": order_obj_id})
+        with span("db"):
+            order = await orders_collection.find_one({"_id": order_obj_id})
         if not order:
             raise HTTPException(status_code=404, detail="Order not found")
-        
-        return OrderInDB(**order)
+
+        with span("build"):
+            item = build_item(order, OrderResponse)
+        return render(item, response)
     except HTTPException:
         raise
     except Exception as e:
+        record_exception(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def batch_lookup(request: BatchRequest, collection, model, response: Response, fmt: Optional[str]):
+    """Entries in input order from one $in; large batches are streamed in chunks."""
+    if fmt or len(request.ids) > settings.batch_stream_threshold:
+        entries = iter_batch_entries(collection, request.ids, model, STREAM_BATCH_SIZE)
+        return streaming_response(entries, fmt or "json")
+    ids = parse_ids(request.ids)
+    with span("db"):
+        found = await fetch_by_ids(collection, ids, model_projection(model))
+    with span("build"):
+        entries = batch_entries(request.ids, ids, found, model)
+    return render(entries, response)
+
+
+@app.post("/products/batch", response_model=List[ProductBatchEntry])
+async def get_products_batch(
+    request: BatchRequest,
+    response: Response,
+    fmt: Optional[str] = Depends(stream_format),
+    products_collection=Depends(get_products_collection)
+):
+    try:
+        return await batch_lookup(request, products_collection, ProductInDB, response, fmt)
+    except HTTPException:
+        raise
+    except Exception as e:
+        record_exception(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/orders/batch", response_model=List[OrderBatchEntry])
+async def get_orders_batch(
+    request: BatchRequest,
+    response: Response,
+    fmt: Optional[str] = Depends(stream_format),
+    orders_collection=Depends(read_collection("orders", "order_detail"))
+):
+    try:
+        return await batch_lookup(request, orders_collection, OrderResponse, response, fmt)
+    except HTTPException:
+        raise
+    except Exception as e:
+        record_exception(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/users/batch", response_model=List[UserBatchEntry])
+async def get_users_batch(
+    request: BatchRequest,
+    response: Response,
+    fmt: Optional[str] = Depends(stream_format),
+    users_collection=Depends(get_users_collection)
+):
+    try:
+        return await batch_lookup(request, users_collection, UserResponse, response, fmt)
+    except HTTPException:
+        raise
+    except Exception as e:
+        record_exception(e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/analytics/top-products", response_model=List[TopProductResponse])
 async def get_top_products_by_category(
+    response: Response,
     days: int = Query(1000, ge=1, le=3650, description="Days to look back"),
     limit: int = Query(5, ge=1, le=20, description="Top products per category"),
     category: Optional[str] = Query(None, description="Filter by category"),
-    orders_collection=Depends(get_orders_collection),
+    per_category: bool = Query(True, description="Rank within each category; false ranks all products together"),
+    rollups_collection=Depends(read_collection(ROLLUPS_COLLECTION, "analytics")),
     products_collection=Depends(get_products_collection)
 ):
     try:
         date_threshold = datetime.utcnow() - timedelta(days=days)
         
-        pipeline = [
-            {"$match": {"timestamp": {"$gte": date_threshold}}},
-            {"$unwind": "$products"},
-            {
-                "$lookup": {
-                    "from": "products",
-                    "localField": "products.product_id",
-                    "foreignField": "_id",
-                    "as": "product_info"
-                }
-            },
-            {"$unwind": "$product_info"},
-            {
-                "$group": {
-                    "_id": "$products.product_id",
-                    "name": {"$first": "$product_info.name"},
-                    "category": {"$first": "$product_info.category"},
-                    "brand": {"$first": "$product_info.brand"},
-                    "price": {"$first": "$product_info.price"},
-                    "purchase_count": {"$sum": 1},
-                    "total_quantity_sold": {"$sum": "$products.quantity"}
-                }
-            }
-        ]
-        
-        if category:
-            pipeline.append({"$match": {"category": category}})
-        
-        pipeline.append({"$sort": {"purchase_count": -1}})
-        pipeline.append({"$limit": limit})
-        
-        cursor = orders_collection.aggregate(pipeline)
+        # Sum the daily rollups in the window (category filter applied before
+        # grouping), then keep the top `limit` per category in a single pass
+        pipeline = top_products_pipeline(date_threshold, category)
+        cursor = rollups_collection.aggregate(pipeline)
+        with span("db"):
+            with query_profiler.track(rollups_collection, "aggregate", pipeline):
+                if per_category:
+                    top_by_category = await top_k_per_category(cursor, limit)
+                    ranked = [row for cat in sorted(top_by_category, key=lambda c: c or "") for row in top_by_category[cat]]
+                else:
+                    ranked = (await top_k_per_category(_single_group(cursor), limit)).get(None, [])
+
+            products_by_id = await product_cache.get_many(products_collection, [row["_id"] for row in ranked])
         top_products = []
-        async for product in cursor:
-            top_products.append(TopProductResponse(**product))
+        with span("build"):
+            for row in ranked:
+                product = products_by_id.get(row["_id"])
+                if not product:
+                    continue
+                row.update(
+                    name=product["name"], category=product["category"],
+                    brand=product["brand"], price=product["price"]
+                )
+                top_products.append(build_item(row, TopProductResponse))
         
-        return top_products
+        return render(top_products, response)
+    except Exception as e:
+        record_exception(e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def _single_group(rows):
+    async for row in rows:
+        yield {**row, "category": None}
+
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    return {"search": search_cache.stats(), "products": product_cache.stats()}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    # Rendered only on scrape; the request path just bumps counters
+    return PlainTextResponse(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@app.get("/debug/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(20, ge=1, le=200),
+    order_by: str = Query("max_ms", pattern="^(max_ms|avg_ms|count|slow_count|scan_ratio)$"),
+):
+    if not settings.query_profiling:
+        raise HTTPException(status_code=404, detail="Query profiling is disabled (set QUERY_PROFILING=true)")
+    return {"slow_queries": query_profiler.slow_queries, "fingerprints": query_profiler.worst(limit, order_by)}
+
+
+@app.get("/debug/index-advice")
+async def get_index_advice():
+    """Missing, unused and redundant indexes, from the profiler's captured queries
+    or, before any are captured, the built-in sample workload."""
+    if not settings.query_profiling:
+        raise HTTPException(status_code=404, detail="Query profiling is disabled (set QUERY_PROFILING=true)")
+    try:
+        db = get_database()
+        queries = query_profiler.samples() or await sample_workload(db)
+        return await advise(db, queries)
     except Exception as e:
+        record_exception(e)
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/db/pool-stats")
+async def get_pool_stats():
+    # Per-server pool counters; wait times are connection checkout durations
+    return {"pools": pool_monitor.stats(), "max_pool_size": settings.mongodb_max_pool_size}
@@ -0,0 +1,217 @@
+# ecommerce_backend/metrics.py
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, Tuple
+from pymongo import monitoring
+
+# In-process latency histograms rendered in Prometheus text format on scrape.
+# Recording is a bisect plus a few increments under a lock; nothing is
+# formatted until /metrics is requested.
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...], buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], seconds: float):
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # [per-bucket counts..., +Inf count, sum]
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += seconds
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            cumulative = 0
+            bounds = [str(bound) for bound in self.buckets] + ["+Inf"]
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: Tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple[str, ...], amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = dict(self._values)
+        for labels, value in sorted(snapshot.items()):
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {value}")
+        return lines
+
+
+request_duration = Histogram(
+    "http_request_duration_seconds", "Time to produce the response headers, per route",
+    ("method", "route", "status"),
+)
+response_duration = Histogram(
+    "http_response_duration_seconds", "Time until the response body has been sent, per route",
+    ("method", "route", "status"),
+)
+stage_duration = Histogram(
+    "http_handler_stage_duration_seconds", "Time spent per handler stage (candidates, db, build, serialize), per route",
+    ("route", "stage"),
+)
+handler_exceptions = Counter(
+    "http_handler_exceptions_total", "Unexpected handler exceptions reported as 500s, by exception type",
+    ("route", "exception"),
+)
+command_duration = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency by collection and command",
+    ("collection", "command", "outcome"),
+)
+
+search_phase_timeouts = Counter(
+    "search_phase_timeouts_total", "Search candidate passes cut off by their latency budget",
+    ("phase",),
+)
+
+REGISTRY = [request_duration, response_duration, stage_duration, handler_exceptions, command_duration, search_phase_timeouts]
+
+# Per-request accumulator: stage -> seconds, plus the exception type if any
+_request_stages: ContextVar[Optional[dict]] = ContextVar("request_stages", default=None)
+
+
+@contextmanager
+def span(stage: str):
+    """Add the enclosed time to `stage` for the current request (no-op outside one)."""
+    stages = _request_stages.get()
+    if stages is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages[stage] = stages.get(stage, 0.0) + time.perf_counter() - start
+
+
+def record_exception(e: Exception):
+    stages = _request_stages.get()
+    if stages is not None:
+        stages["__exception__"] = type(e).__name__
+
+
+class TimingMiddleware:
+    """Pure ASGI middleware timing each request from its response messages.
+
+    request_duration runs to http.response.start (the headers) and
+    response_duration to the last body message, which for streamed listings
+    is when the final chunk has been sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+        stages: dict = {}
+        token = _request_stages.set(stages)
+        start = time.perf_counter()
+        timing = {"status": 500, "headers": None}
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                timing["status"] = message["status"]
+                timing["headers"] = time.perf_counter()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            end = time.perf_counter()
+            _request_stages.reset(token)
+            # Label by route template, not the raw path, to keep cardinality bounded
+            route_path = getattr(scope.get("route"), "path", "unmatched")
+            status = str(timing["status"])
+            request_duration.observe((scope["method"], route_path, status), (timing["headers"] or end) - start)
+            response_duration.observe((scope["method"], route_path, status), end - start)
+            exception = stages.pop("__exception__", None)
+            if exception:
+                handler_exceptions.inc((route_path, exception))
+            for stage, seconds in stages.items():
+                stage_duration.observe((route_path, stage), seconds)
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Feeds command_duration from driver command events."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._collections: Dict[Tuple, str] = {}
+
+    @staticmethod
+    def _key(event) -> Tuple:
+        return (event.connection_id, event.request_id)
+
+    def started(self, event):
+        # getMore names its collection separately; the command value is the cursor id
+        target = event.command.get("collection" if event.command_name == "getMore" else event.command_name)
+        collection = target if isinstance(target, str) else "-"
+        with self._lock:
+            self._collections[self._key(event)] = collection
+
+    def _finish(self, event, outcome: str):
+        with self._lock:
+            collection = self._collections.pop(self._key(event), "-")
+        command_duration.observe((collection, event.command_name, outcome), event.duration_micros / 1e6)
+
+    def succeeded(self, event):
+        self._finish(event, "success")
+
+    def failed(self, event):
+        self._finish(event, "failure")
+
+
+command_metrics = CommandMetrics()
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
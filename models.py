@@ -1,7 +1,8 @@
-from pydantic import BaseModel, Field, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, Field, EmailStr, field_validator
+from typing import Dict, Optional, List
 from datetime import datetime
 from bson import ObjectId
+from config import settings
 
 
 class PyObjectId(str):
@@ -71,6 +72,44 @@ class UserResponse(UserInDB):
     pass
 
 
+class UserUpdate(BaseModel):
+    name: Optional[str] = Field(None, min_length=1)
+    email: Optional[EmailStr] = None
+    location: Optional[str] = None
+
+    @field_validator("name", "email")
+    @classmethod
+    def not_null(cls, value):
+        # Omit a field to leave it unchanged; only location can be cleared
+        if value is None:
+            raise ValueError("may be omitted but not null")
+        return value
+
+
+
+class FacetValue(BaseModel):
+    value: str
+    count: int
+
+
+class PriceBucket(BaseModel):
+    # min/max are None for prices outside the configured boundaries
+    min: Optional[float] = None
+    max: Optional[float] = None
+    count: int
+
+
+class SearchFacets(BaseModel):
+    category: List[FacetValue] = []
+    brand: List[FacetValue] = []
+    price: List[PriceBucket] = []
+
+
+class FacetedSearchResponse(BaseModel):
+    items: List[SearchProductResponse]
+    total: int
+    facets: SearchFacets
+
 # Order Models 
 class OrderProduct(BaseModel):
     product_id: PyObjectId
@@ -94,6 +133,30 @@ class OrderResponse(OrderInDB):
     pass
 
 
+class OrderLineCreate(BaseModel):
+    product_id: PyObjectId
+    quantity: int = Field(..., ge=1)
+    model_config = {"arbitrary_types_allowed": True}
+
+
+class OrderCreate(BaseModel):
+    # Names and prices come from the catalog, not the client
+    user_id: PyObjectId
+    products: List[OrderLineCreate] = Field(..., min_length=1)
+    model_config = {"arbitrary_types_allowed": True}
+
+
+class BulkOrderRequest(BaseModel):
+    orders: List[OrderCreate] = Field(..., min_length=1, max_length=settings.order_bulk_max_orders)
+
+
+class OrderCreateResult(BaseModel):
+    # created, user_not_found, product_not_found or insufficient_stock
+    status: str
+    order: Optional[OrderResponse] = None
+    detail: Optional[str] = None
+
+
 class EnhancedOrderProduct(BaseModel):
     product_id: PyObjectId
     name: str
@@ -134,10 +197,27 @@ class ReviewInDB(BaseModel):
 
 
 class ReviewWithUser(ReviewInDB):
+    # Author snapshot embedded in the review (see reviewers.py)
     user_name: Optional[str] = None
     user_email: Optional[str] = None
 
 
+class ReviewCreate(BaseModel):
+    user_id: PyObjectId
+    rating: int = Field(..., ge=1, le=5)
+    review_text: Optional[str] = None
+    model_config = {"arbitrary_types_allowed": True}
+
+
+class RatingSummary(BaseModel):
+    product_id: PyObjectId
+    average: float = 0
+    count: int = 0
+    # Review count per star, "1" to "5"
+    histogram: Dict[str, int]
+    model_config = {"arbitrary_types_allowed": True}
+
+
 # Aggregation Response Models 
 class TopProductResponse(BaseModel):
     id: PyObjectId = Field(alias="_id")
@@ -147,5 +227,29 @@ class TopProductResponse(BaseModel):
     price: float
     purchase_count: int
     total_quantity_sold: int
+    revenue: Optional[float] = None
     model_config = {"arbitrary_types_allowed": True, "populate_by_name": True}
 
+
+# Batch Lookup Models 
+class BatchRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=settings.batch_max_ids)
+
+
+class ProductBatchEntry(BaseModel):
+    id: str
+    # found, not_found or invalid_id
+    status: str
+    item: Optional[ProductInDB] = None
+
+
+class OrderBatchEntry(BaseModel):
+    id: str
+    status: str
+    item: Optional[OrderResponse] = None
+
+
+class UserBatchEntry(BaseModel):
+    id: str
+    status: str
+    item: Optional[UserResponse] = None
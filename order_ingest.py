@@ -0,0 +1,292 @@
+# ecommerce_backend/order_ingest.py
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from bson import ObjectId
+from pymongo import UpdateOne
+from bulk_writes import bulk_write_batched
+from config import settings
+import popularity
+import rollups
+from search_cache import search_cache
+
+# Write path for new orders. Requests are queued for a short window and
+# written together: one read of the users and products involved, a
+# conditional stock decrement per product, one insert_many, and the derived
+# counters (product popularity, daily rollups, per-user order stats) in the
+# same flush. If the insert or a counter write fails, the flush's orders are
+# removed and their stock is given back.
+CREATED = "created"
+USER_NOT_FOUND = "user_not_found"
+PRODUCT_NOT_FOUND = "product_not_found"
+INSUFFICIENT_STOCK = "insufficient_stock"
+NEW_ORDER_STATUS = "pending"
+
+
+class OrderRejected(Exception):
+    def __init__(self, status: str, detail: str):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+def from_request(order) -> dict:
+    # Attribute access keeps ObjectIds (model_dump would render them as str)
+    return {
+        "user_id": order.user_id,
+        "products": [{"product_id": line.product_id, "quantity": line.quantity} for line in order.products],
+    }
+
+
+def _demand(order: dict) -> Dict[ObjectId, int]:
+    demand: Dict[ObjectId, int] = {}
+    for line in order["products"]:
+        demand[line["product_id"]] = demand.get(line["product_id"], 0) + line["quantity"]
+    return demand
+
+
+def price_order(order: dict, products: Dict[ObjectId, dict], now: datetime) -> dict:
+    """OrderInDB document with names and prices taken from the catalog."""
+    lines = []
+    for pid, quantity in _demand(order).items():
+        product = products[pid]
+        lines.append({
+            "product_id": pid,
+            "name": product["name"],
+            "price_at_purchase": product["price"],
+            "quantity": quantity,
+        })
+    return {
+        "_id": ObjectId(),
+        "user_id": order["user_id"],
+        "products": lines,
+        "total_cost": round(sum(line["price_at_purchase"] * line["quantity"] for line in lines), 2),
+        "status": NEW_ORDER_STATUS,
+        "timestamp": now,
+    }
+
+
+def user_stats_ops(orders: List[dict]) -> List[UpdateOne]:
+    totals: Dict[ObjectId, list] = {}
+    for order in orders:
+        entry = totals.setdefault(order["user_id"], [0, 0.0, order["timestamp"]])
+        entry[0] += 1
+        entry[1] += order["total_cost"]
+        entry[2] = max(entry[2], order["timestamp"])
+    return [
+        UpdateOne({"_id": uid}, {
+            "$inc": {"order_count": count, "total_spent": round(spent, 2)},
+            "$max": {"last_order_at": last},
+        })
+        for uid, (count, spent, last) in totals.items()
+    ]
+
+
+async def backfill_user_order_stats(db, batch_size: int = 1000) -> int:
+    """Recompute order_count/total_spent/last_order_at on every user from `orders`."""
+    users = db["users"]
+    pipeline = [{"$group": {
+        "_id": "$user_id",
+        "order_count": {"$sum": 1},
+        "total_spent": {"$sum": "$total_cost"},
+        "last_order_at": {"$max": "$timestamp"},
+    }}]
+    await users.update_many({}, {"$set": {"order_count": 0, "total_spent": 0.0}})
+    ops = (
+        UpdateOne({"_id": row.pop("_id")}, {"$set": row})
+        async for row in db["orders"].aggregate(pipeline, allowDiskUse=True)
+    )
+    updated = await bulk_write_batched(users, ops, batch_size)
+    print(f"Backfilled order stats for {updated} users")
+    return updated
+
+
+class OrderWriter:
+    """Micro-batches order submissions into one write flush.
+
+    A flush starts `window_ms` after the first queued order, or as soon as
+    `max_batch` orders are queued. Flushes run one at a time, so stock read at
+    the start of a flush is only changed by this process's own decrements.
+    """
+
+    def __init__(self, window_ms: float, max_batch: int):
+        self.window_ms = window_ms
+        self.max_batch = max_batch
+        self._pending: List[Tuple[dict, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._lock = asyncio.Lock()
+        self._tasks = set()
+        self._db = None
+        self.flushes = 0
+        self.created = 0
+        self.rejected = 0
+
+    async def submit(self, db, orders: List[dict]) -> List:
+        """Queue validated OrderCreate dicts; each result is an order document or OrderRejected."""
+        self._db = db
+        loop = asyncio.get_running_loop()
+        futures = []
+        for order in orders:
+            future = loop.create_future()
+            self._pending.append((order, future))
+            futures.append(future)
+        if len(self._pending) >= self.max_batch:
+            self._start_flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_ms / 1000, self._start_flush)
+        return await asyncio.gather(*futures)
+
+    def _start_flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            task = asyncio.get_running_loop().create_task(self._flush(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self, batch: List[Tuple[dict, asyncio.Future]]):
+        async with self._lock:
+            try:
+                results = await self._write(self._db, [order for order, _ in batch])
+            except Exception as e:
+                print(f"Order flush of {len(batch)} orders failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            self.flushes += 1
+            for (_, future), result in zip(batch, results):
+                if isinstance(result, OrderRejected):
+                    self.rejected += 1
+                else:
+                    self.created += 1
+                if not future.done():
+                    future.set_result(result)
+
+    async def _write(self, db, orders: List[dict]) -> List:
+        users_col, products_col = db["users"], db["products"]
+        demands = [_demand(order) for order in orders]
+        user_ids = list({order["user_id"] for order in orders})
+        product_ids = list({pid for demand in demands for pid in demand})
+        known_users = {doc["_id"] async for doc in users_col.find({"_id": {"$in": user_ids}}, {"_id": 1})}
+        products = {
+            doc["_id"]: doc
+            async for doc in products_col.find({"_id": {"$in": product_ids}}, {"name": 1, "price": 1, "stock": 1})
+        }
+
+        # Admit orders in arrival order against the stock read above
+        results: List = [None] * len(orders)
+        available = {pid: doc.get("stock") or 0 for pid, doc in products.items()}
+        reserved: Dict[ObjectId, int] = {}
+        for i, (order, demand) in enumerate(zip(orders, demands)):
+            if order["user_id"] not in known_users:
+                results[i] = OrderRejected(USER_NOT_FOUND, f"User {order['user_id']} not found")
+                continue
+            missing = [pid for pid in demand if pid not in products]
+            if missing:
+                results[i] = OrderRejected(PRODUCT_NOT_FOUND, f"Product {missing[0]} not found")
+                continue
+            short = [pid for pid, qty in demand.items() if available[pid] < qty]
+            if short:
+                results[i] = OrderRejected(INSUFFICIENT_STOCK, f"Insufficient stock for product {short[0]}")
+                continue
+            for pid, qty in demand.items():
+                available[pid] -= qty
+                reserved[pid] = reserved.get(pid, 0) + qty
+
+        failed = await self._reserve_stock(products_col, reserved)
+        if failed:
+            # Another writer took the stock since it was read: drop every
+            # admitted order touching those products and give back the rest
+            released: Dict[ObjectId, int] = {}
+            for i, demand in enumerate(demands):
+                if results[i] is None and failed.intersection(demand):
+                    results[i] = OrderRejected(INSUFFICIENT_STOCK, "Insufficient stock")
+                    for pid, qty in demand.items():
+                        if pid not in failed:
+                            released[pid] = released.get(pid, 0) + qty
+            await self._release_stock(products_col, released)
+
+        now = datetime.utcnow()
+        new_orders = []
+        for i, order in enumerate(orders):
+            if results[i] is None:
+                results[i] = price_order(order, products, now)
+                new_orders.append(results[i])
+        if new_orders:
+            try:
+                await db["orders"].insert_many(new_orders, ordered=False)
+                written = await asyncio.gather(
+                    popularity.record_orders(db, new_orders),
+                    rollups.record_orders(db, new_orders),
+                    users_col.bulk_write(user_stats_ops(new_orders), ordered=False),
+                    return_exceptions=True,
+                )
+                errors = [result for result in written if isinstance(result, Exception)]
+                if errors:
+                    raise errors[0]
+            except Exception:
+                await self._undo_orders(db, new_orders)
+                raise
+            # Cached search pages show stock
+            search_cache.evict_products({line["product_id"] for order in new_orders for line in order["products"]})
+        return results
+
+    @staticmethod
+    async def _reserve_stock(products_col, reserved: Dict[ObjectId, int]) -> set:
+        """Conditionally decrement stock per product; returns the products that could not be reserved."""
+        if not reserved:
+            return set()
+        pids = list(reserved)
+        updates = await asyncio.gather(*(
+            products_col.update_one({"_id": pid, "stock": {"$gte": reserved[pid]}}, {"$inc": {"stock": -reserved[pid]}})
+            for pid in pids
+        ), return_exceptions=True)
+        applied = {pid: reserved[pid] for pid, result in zip(pids, updates)
+                   if not isinstance(result, Exception) and result.matched_count}
+        errors = [result for result in updates if isinstance(result, Exception)]
+        if errors:
+            await OrderWriter._release_stock(products_col, applied)
+            raise errors[0]
+        return set(reserved) - set(applied)
+
+    @staticmethod
+    async def _release_stock(products_col, quantities: Dict[ObjectId, int]):
+        if quantities:
+            await products_col.bulk_write(
+                [UpdateOne({"_id": pid}, {"$inc": {"stock": qty}}) for pid, qty in quantities.items()],
+                ordered=False,
+            )
+
+    @staticmethod
+    async def _undo_orders(db, new_orders: List[dict]):
+        """Remove a failed flush's orders and give their stock back.
+
+        Counter writes that did land stay until the next rebuild_popularity /
+        backfill_rollups / backfill_user_order_stats run.
+        """
+        released: Dict[ObjectId, int] = {}
+        for order in new_orders:
+            for line in order["products"]:
+                released[line["product_id"]] = released.get(line["product_id"], 0) + line["quantity"]
+        try:
+            await db["orders"].delete_many({"_id": {"$in": [order["_id"] for order in new_orders]}})
+            await OrderWriter._release_stock(db["products"], released)
+        except Exception as e:
+            print(f"Could not undo failed order flush ({len(new_orders)} orders): {e}")
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "created": self.created,
+            "rejected": self.rejected,
+        }
+
+
+order_writer = OrderWriter(
+    window_ms=settings.order_batch_window_ms,
+    max_batch=settings.order_batch_max_orders,
+)
@@ -0,0 +1,81 @@
+# ecommerce_backend/pagination.py
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+from bson import ObjectId
+
+# Keyset pagination: a cursor carries the sort-key values of the last item on
+# a page, and the next page seeks past them instead of skipping N documents.
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Keyset orders; _id breaks timestamp ties so cursors are stable
+USER_ORDERS_SORT = [("timestamp", -1), ("_id", -1)]
+REVIEWS_SORT = [("timestamp", -1), ("_id", -1)]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _encode_value(v: Any):
+    if isinstance(v, ObjectId):
+        return {"$oid": str(v)}
+    if isinstance(v, datetime):
+        return {"$date": v.isoformat()}
+    return v
+
+
+def _decode_value(v: Any):
+    if isinstance(v, dict):
+        if "$oid" in v:
+            return ObjectId(v["$oid"])
+        if "$date" in v:
+            return datetime.fromisoformat(v["$date"])
+    return v
+
+
+def encode_cursor(kind: str, values: Sequence[Any]) -> str:
+    payload = json.dumps({"k": kind, "v": [_encode_value(v) for v in values]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, kind: str, size: int) -> List[Any]:
+    """The `size` values of a `kind` cursor; raises InvalidCursor for anything else."""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload.get("k") != kind:
+            raise InvalidCursor("Cursor does not belong to this listing")
+        if not isinstance(payload["v"], list) or len(payload["v"]) != size:
+            raise InvalidCursor("Malformed cursor")
+        return [_decode_value(v) for v in payload["v"]]
+    except InvalidCursor:
+        raise
+    except Exception as e:
+        raise InvalidCursor("Malformed cursor") from e
+
+
+def seek_filter(sort_fields: Sequence[Tuple[str, int]], values: Sequence[Any]) -> dict:
+    """Match documents strictly after `values` in the given sort order."""
+    clauses = []
+    for i, (field, direction) in enumerate(sort_fields):
+        clause = {f: values[j] for j, (f, _) in enumerate(sort_fields[:i])}
+        clause[field] = {"$gt" if direction == 1 else "$lt": values[i]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+
+def sort_values(doc: dict, sort_fields: Sequence[Tuple[str, int]]) -> List[Any]:
+    values = []
+    for field, _ in sort_fields:
+        value: Any = doc
+        for part in field.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        values.append(value)
+    return values
+
+
+def next_cursor(kind: str, docs: Sequence[dict], limit: Optional[int], sort_fields) -> Optional[str]:
+    if not docs or limit is None or len(docs) < limit:
+        return None
+    return encode_cursor(kind, sort_values(docs[-1], sort_fields))
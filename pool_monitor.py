@@ -0,0 +1,104 @@
+# ecommerce_backend/pool_monitor.py
+import threading
+from collections import defaultdict
+from pymongo import monitoring
+
+# Connection pool counters per server address, fed by PyMongo's pool events.
+# Motor runs PyMongo on worker threads, so updates are guarded by a lock.
+
+
+def _new_pool_stats() -> dict:
+    return {
+        "connections_open": 0,
+        "checked_out": 0,
+        "checkouts": 0,
+        "checkout_failures": 0,
+        "wait_total_ms": 0.0,
+        "wait_max_ms": 0.0,
+        "pool_cleared": 0,
+    }
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pools = defaultdict(_new_pool_stats)
+
+    @staticmethod
+    def _key(event) -> str:
+        host, port = event.address
+        return f"{host}:{port}"
+
+    def _pool(self, event) -> dict:
+        return self._pools[self._key(event)]
+
+    def pool_created(self, event):
+        with self._lock:
+            self._pool(event)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._pool(event)["pool_cleared"] += 1
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._pools.pop(self._key(event), None)
+
+    def connection_created(self, event):
+        with self._lock:
+            self._pool(event)["connections_open"] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            pool = self._pool(event)
+            pool["connections_open"] = max(0, pool["connections_open"] - 1)
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            pool = self._pool(event)
+            pool["checkout_failures"] += 1
+            self._record_wait(pool, event)
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            pool = self._pool(event)
+            pool["checked_out"] += 1
+            pool["checkouts"] += 1
+            self._record_wait(pool, event)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            pool = self._pool(event)
+            pool["checked_out"] = max(0, pool["checked_out"] - 1)
+
+    @staticmethod
+    def _record_wait(pool: dict, event):
+        # duration (seconds) covers the whole checkout, including waiting for a free connection
+        wait_ms = (getattr(event, "duration", 0.0) or 0.0) * 1000
+        pool["wait_total_ms"] += wait_ms
+        pool["wait_max_ms"] = max(pool["wait_max_ms"], wait_ms)
+
+    def stats(self) -> dict:
+        with self._lock:
+            pools = {}
+            for address, pool in self._pools.items():
+                attempts = pool["checkouts"] + pool["checkout_failures"]
+                pools[address] = {
+                    **pool,
+                    "wait_total_ms": round(pool["wait_total_ms"], 3),
+                    "wait_max_ms": round(pool["wait_max_ms"], 3),
+                    "wait_avg_ms": round(pool["wait_total_ms"] / attempts, 3) if attempts else 0.0,
+                }
+            return pools
+
+
+pool_monitor = PoolMonitor()
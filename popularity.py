@@ -0,0 +1,99 @@
+# ecommerce_backend/popularity.py
+from datetime import datetime, timedelta
+from typing import Iterable, List, Optional
+from pymongo import UpdateOne
+from bulk_writes import bulk_write_batched
+from search_cache import search_cache
+from ranking import refresh_static_scores
+
+# Popularity is denormalised onto each product document so search can sort and
+# rank on a plain field instead of joining into `orders` for every candidate:
+#   popularity -> number of orders containing the product
+#   units_sold -> total quantity purchased across those orders
+BATCH_SIZE = 1000
+
+
+def count_purchases(orders: Iterable[dict]) -> dict:
+    """Map product_id -> [orders containing it, units purchased]."""
+    counts: dict = {}
+    for order in orders:
+        seen = set()
+        for line in order.get("products") or []:
+            pid = line.get("product_id")
+            if pid is None:
+                continue
+            entry = counts.setdefault(pid, [0, 0])
+            if pid not in seen:
+                entry[0] += 1
+                seen.add(pid)
+            entry[1] += int(line.get("quantity") or 0)
+    return counts
+
+
+def popularity_ops(counts: dict) -> List[UpdateOne]:
+    return [
+        UpdateOne({"_id": pid}, {"$inc": {"popularity": c, "units_sold": q}})
+        for pid, (c, q) in counts.items()
+    ]
+
+
+async def record_orders(db, orders: Iterable[dict]):
+    """Incrementally apply newly written orders to the product counters."""
+    counts = count_purchases(orders)
+    if counts:
+        await db["products"].bulk_write(popularity_ops(counts), ordered=False)
+        await refresh_static_scores(db, counts.keys())
+        search_cache.note_popularity_change(sum(c for c, _ in counts.values()))
+    return len(counts)
+
+
+async def rebuild_popularity(db, window_days: Optional[int] = None):
+    """Recompute every product's counters from `orders`.
+
+    With `window_days` only orders inside the window are counted; re-run it
+    periodically to keep a windowed count fresh.
+    """
+    stamp = datetime.utcnow()
+    pipeline: List[dict] = []
+    if window_days:
+        pipeline.append({"$match": {"timestamp": {"$gte": stamp - timedelta(days=window_days)}}})
+    pipeline.extend([
+        {"$unwind": "$products"},
+        {"$group": {
+            "_id": {"order": "$_id", "pid": "$products.product_id"},
+            "qty": {"$sum": "$products.quantity"},
+        }},
+        {"$group": {"_id": "$_id.pid", "popularity": {"$sum": 1}, "units_sold": {"$sum": "$qty"}}},
+    ])
+
+    products_col = db["products"]
+    ops = (
+        UpdateOne({"_id": row["_id"]}, {"$set": {
+            "popularity": row["popularity"],
+            "units_sold": row["units_sold"],
+            "popularity_rebuilt_at": stamp,
+        }})
+        async for row in db["orders"].aggregate(pipeline, allowDiskUse=True)
+    )
+    updated = await bulk_write_batched(products_col, ops, BATCH_SIZE)
+
+    # Anything not touched above has no (windowed) orders left
+    await products_col.update_many(
+        {"popularity_rebuilt_at": {"$ne": stamp}},
+        {"$set": {"popularity": 0, "units_sold": 0, "popularity_rebuilt_at": stamp}},
+    )
+    await refresh_static_scores(db)
+    search_cache.invalidate()
+    print(f"Rebuilt popularity counters for {updated} products")
+    return updated
+
+
+if __name__ == "__main__":
+    import argparse
+    from bulk_writes import run_with_database
+
+    parser = argparse.ArgumentParser(description="Rebuild product popularity counters from orders")
+    parser.add_argument("--window-days", type=int, default=None)
+    args = parser.parse_args()
+
+    run_with_database(lambda db: rebuild_popularity(db, args.window_days))
@@ -0,0 +1,229 @@
+# ecommerce_backend/product_cache.py
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from bson import ObjectId
+from pymongo.errors import OperationFailure, PyMongoError
+from config import settings
+from fuzzy_index import fuzzy_index
+from facets import facet_dictionary, stale_normalized_fields
+from ranking import stale_static_score
+from search_cache import search_cache
+
+# Only catalog fields are cached; counters such as popularity/stock change on
+# every order and are always read from the database.
+CATALOG_FIELDS = ("name", "description", "category", "brand", "price", "updated_at")
+CATALOG_PROJECTION = {field: 1 for field in CATALOG_FIELDS}
+# "$changeStream stage is only supported on replica sets" (standalone mongod)
+CHANGE_STREAMS_UNSUPPORTED = 40573
+
+
+class ChangeStreamsUnsupported(Exception):
+    pass
+
+
+class CachedProduct:
+    __slots__ = ("_id",) + CATALOG_FIELDS
+
+    def __init__(self, doc: dict):
+        self._id = doc["_id"]
+        for field in CATALOG_FIELDS:
+            setattr(self, field, doc.get(field))
+
+    def to_dict(self) -> dict:
+        doc = {"_id": self._id}
+        for field in CATALOG_FIELDS:
+            doc[field] = getattr(self, field)
+        return doc
+
+
+class ProductCache:
+    """Bounded in-memory LRU of product catalog entries keyed by ObjectId.
+
+    Kept fresh by a change stream on `products`; when the server does not
+    support change streams (standalone mongod, test doubles) it falls back to
+    polling `updated_at`.
+    """
+
+    def __init__(self, max_entries: int, poll_interval: float):
+        self.max_entries = max_entries
+        self.poll_interval = poll_interval
+        self._entries: "OrderedDict[ObjectId, CachedProduct]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+        self._last_seen: Optional[datetime] = None
+        self.mode = "stopped"
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def put(self, doc: dict):
+        if self.max_entries <= 0:
+            return
+        entry = CachedProduct(doc)
+        self._entries[entry._id] = entry
+        self._entries.move_to_end(entry._id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def evict(self, pid: ObjectId):
+        self._entries.pop(pid, None)
+
+    def get_cached(self, pid: ObjectId) -> Optional[CachedProduct]:
+        entry = self._entries.get(pid)
+        if entry is not None:
+            self._entries.move_to_end(pid)
+        return entry
+
+    async def get_many(self, products_collection, ids: Iterable[ObjectId]) -> Dict[ObjectId, dict]:
+        found: Dict[ObjectId, dict] = {}
+        missing: List[ObjectId] = []
+        for pid in ids:
+            entry = self.get_cached(pid)
+            if entry is not None:
+                found[pid] = entry.to_dict()
+            else:
+                missing.append(pid)
+        self.hits += len(found)
+        self.misses += len(missing)
+
+        if missing:
+            async for doc in products_collection.find({"_id": {"$in": missing}}, CATALOG_PROJECTION):
+                self.put(doc)
+                found[doc["_id"]] = doc
+        return found
+
+    async def get(self, products_collection, pid: ObjectId) -> Optional[dict]:
+        return (await self.get_many(products_collection, [pid])).get(pid)
+
+    async def exists(self, products_collection, pid: ObjectId) -> bool:
+        return await self.get(products_collection, pid) is not None
+
+    async def warm(self, products_collection):
+        self._entries.clear()
+        # Hottest products first so a partial warm-up still covers most reads
+        cursor = products_collection.find({}, CATALOG_PROJECTION).sort("popularity", -1).limit(self.max_entries)
+        async for doc in cursor:
+            self.put(doc)
+        self._entries = OrderedDict(reversed(self._entries.items()))
+        latest = await products_collection.find_one({}, {"updated_at": 1}, sort=[("updated_at", -1)])
+        self._last_seen = latest.get("updated_at") if latest else None
+        print(f"Warmed product cache with {len(self)} products")
+
+    def apply_change(self, doc: Optional[dict] = None, deleted_id: Optional[ObjectId] = None):
+        if deleted_id is not None:
+            self.evict(deleted_id)
+            fuzzy_index.remove_product(deleted_id)
+        elif doc is not None:
+            if doc["_id"] in self._entries:
+                self.put(doc)
+            fuzzy_index.add_product(doc)
+        fuzzy_index.schedule_save()
+        search_cache.invalidate()
+        facet_dictionary.invalidate()
+
+    async def _repair_derived(self, products_collection, doc: Optional[dict]):
+        # Writers outside this service may change category/brand/price without
+        # the derived fields; fix them up as the change is observed
+        if not doc:
+            return
+        stale = stale_normalized_fields(doc)
+        score = stale_static_score(doc)
+        if score is not None:
+            stale["static_score"] = score
+        if stale:
+            await products_collection.update_one({"_id": doc["_id"]}, {"$set": stale})
+
+    async def _watch(self, products_collection):
+        catalog_updated = [
+            {f"updateDescription.updatedFields.{field}": {"$exists": True}} for field in CATALOG_FIELDS
+        ]
+        pipeline = [{"$match": {"$or": [
+            {"operationType": {"$in": ["insert", "replace", "delete"]}},
+            {"operationType": "update", "$or": catalog_updated},
+        ]}}]
+        try:
+            stream = products_collection.watch(pipeline, full_document="updateLookup")
+        except (TypeError, NotImplementedError) as e:
+            # In-process doubles such as mongomock have no watch() at all
+            raise ChangeStreamsUnsupported(str(e)) from e
+        async with stream:
+            self.mode = "change_stream"
+            print("Product cache listening to change stream")
+            async for change in stream:
+                if change["operationType"] == "delete":
+                    self.apply_change(deleted_id=change["documentKey"]["_id"])
+                else:
+                    self.apply_change(doc=change.get("fullDocument"))
+                    await self._repair_derived(products_collection, change.get("fullDocument"))
+
+    async def _poll(self, products_collection):
+        self.mode = "polling"
+        print(f"Product cache polling every {self.poll_interval}s (change streams unavailable)")
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            query = {"updated_at": {"$gt": self._last_seen}} if self._last_seen else {}
+            try:
+                async for doc in products_collection.find(query):
+                    self.apply_change(doc=doc)
+                    await self._repair_derived(products_collection, doc)
+                    if doc.get("updated_at") and (self._last_seen is None or doc["updated_at"] > self._last_seen):
+                        self._last_seen = doc["updated_at"]
+            except PyMongoError as e:
+                print(f"Product cache poll failed: {e}")
+            except Exception as e:
+                print(f"Product cache poll failed unexpectedly: {e!r}")
+
+    async def _run(self, products_collection):
+        while True:
+            try:
+                await self._watch(products_collection)
+            except ChangeStreamsUnsupported:
+                break
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAMS_UNSUPPORTED:
+                    break
+                print(f"Product change stream failed: {e}; reconnecting")
+            except PyMongoError as e:
+                print(f"Product change stream interrupted: {e}; reconnecting")
+            except Exception as e:
+                # A bug handling one change must not stop invalidation for good
+                print(f"Product change stream listener failed unexpectedly: {e!r}; restarting")
+            await asyncio.sleep(self.poll_interval)
+        await self._poll(products_collection)
+
+    def start(self, products_collection):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(products_collection))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.mode = "stopped"
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "mode": self.mode,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+product_cache = ProductCache(
+    max_entries=settings.product_cache_max_entries,
+    poll_interval=settings.product_cache_poll_interval_seconds,
+)
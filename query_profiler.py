@@ -0,0 +1,225 @@
+# ecommerce_backend/query_profiler.py
+import asyncio
+import hashlib
+import json
+import random
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional
+from config import settings
+
+# Opt-in query plan capture. Each tracked query is reduced to a shape (values
+# replaced by "?") and fingerprinted; new fingerprints and a random sample of
+# repeats are re-run as explain("executionStats") in the background, and the
+# scan counts and winning plan are kept per fingerprint. Queries over the
+# latency or docs-examined/returned threshold are logged.
+
+MAX_EXPLAINS_IN_FLIGHT = 2
+
+
+def _is_scalar(value) -> bool:
+    return not isinstance(value, (dict, list))
+
+
+def query_shape(value):
+    """Structure of a filter/pipeline with literal values masked out."""
+    if isinstance(value, dict):
+        return {key: "?" if key in ("$skip", "$limit") else query_shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        if all(_is_scalar(item) and not (isinstance(item, str) and item.startswith("$")) for item in value):
+            return "[?]"
+        return [query_shape(item) for item in value]
+    # Field paths, sort/projection directions and flags shape the plan; keep them
+    if isinstance(value, str) and value.startswith("$"):
+        return value
+    if isinstance(value, bool) or (isinstance(value, int) and value in (-1, 0, 1)):
+        return value
+    return "?"
+
+
+def fingerprint(collection_name: str, kind: str, shape) -> str:
+    encoded = json.dumps([collection_name, kind, shape], default=str, separators=(",", ":"))
+    return hashlib.sha1(encoded.encode()).hexdigest()[:12]
+
+
+def find_execution_stats(explain: dict) -> Optional[dict]:
+    # Location varies: top level (find, pushed-down aggregates), under
+    # stages[0].$cursor (classic aggregates) or per shard
+    if "executionStats" in explain:
+        return explain["executionStats"]
+    for stage in explain.get("stages", []):
+        cursor = stage.get("$cursor")
+        if cursor and "executionStats" in cursor:
+            return cursor["executionStats"]
+    for shard in explain.get("shards", {}).values():
+        stats = find_execution_stats(shard)
+        if stats:
+            return stats
+    return None
+
+
+def find_winning_plan(explain: dict) -> Optional[dict]:
+    planner = explain.get("queryPlanner")
+    if planner is None:
+        for stage in explain.get("stages", []):
+            planner = stage.get("$cursor", {}).get("queryPlanner")
+            if planner:
+                break
+    if not planner:
+        return None
+    plan = planner.get("winningPlan", {})
+    # Slot-based engine nests the classic-style tree under queryPlan
+    return plan.get("queryPlan", plan)
+
+
+def iter_plan(plan: Optional[dict]):
+    """Every stage of a winning plan tree, parents first."""
+    if not plan:
+        return
+    yield plan
+    for child in plan.get("inputStages") or []:
+        yield from iter_plan(child)
+    yield from iter_plan(plan.get("inputStage"))
+
+
+async def run_explain(collection, kind: str, spec) -> dict:
+    """explain("executionStats") of an aggregate pipeline or a find spec."""
+    if kind == "aggregate":
+        command = {"aggregate": collection.name, "pipeline": spec, "cursor": {}}
+    else:
+        command = {"find": collection.name, **spec}
+    return await collection.database.command({"explain": command, "verbosity": "executionStats"})
+
+
+def plan_summary(plan: Optional[dict]) -> str:
+    """Winning plan as e.g. 'LIMIT > FETCH > IXSCAN(category_norm_price_index)'."""
+    parts = []
+    while plan:
+        label = plan.get("stage", "?")
+        if plan.get("indexName"):
+            label += f"({plan['indexName']})"
+        parts.append(label)
+        children = plan.get("inputStages")
+        if children:
+            parts.append("[" + " | ".join(plan_summary(child) for child in children) + "]")
+            break
+        plan = plan.get("inputStage")
+    return " > ".join(parts)
+
+
+class QueryProfiler:
+    def __init__(self, max_fingerprints: int = 500):
+        self.max_fingerprints = max_fingerprints
+        self._records: "OrderedDict[str, dict]" = OrderedDict()
+        self._explains_in_flight = 0
+        self._tasks = set()
+        self.slow_queries = 0
+
+    @contextmanager
+    def track(self, collection, kind: str, spec):
+        """Time the enclosed query and hand it to the profiler (no-op unless enabled)."""
+        if not settings.query_profiling:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(collection, kind, spec, (time.perf_counter() - start) * 1000)
+
+    def observe(self, collection, kind: str, spec, elapsed_ms: float):
+        shape = query_shape(spec)
+        key = fingerprint(collection.name, kind, shape)
+        record = self._records.get(key)
+        if record is None:
+            record = self._records[key] = {
+                "fingerprint": key, "collection": collection.name, "kind": kind, "shape": shape,
+                "count": 0, "total_ms": 0.0, "max_ms": 0.0, "slow_count": 0,
+                "explains": 0, "last_explain_at": None, "explain": None,
+            }
+            if len(self._records) > self.max_fingerprints:
+                self._records.popitem(last=False)
+        else:
+            self._records.move_to_end(key)
+        # Latest concrete query of this shape, replayed by the index advisor
+        record["sample"] = spec
+        record["count"] += 1
+        record["total_ms"] += elapsed_ms
+        record["max_ms"] = max(record["max_ms"], elapsed_ms)
+
+        if elapsed_ms >= settings.slow_query_ms:
+            self._report_slow(record, f"{elapsed_ms:.1f} ms")
+
+        if self._should_explain(record):
+            record["last_explain_at"] = time.monotonic()
+            self._explains_in_flight += 1
+            task = asyncio.get_running_loop().create_task(self._explain(collection, kind, spec, record))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _should_explain(self, record: dict) -> bool:
+        if self._explains_in_flight >= MAX_EXPLAINS_IN_FLIGHT:
+            return False
+        last = record["last_explain_at"]
+        if last is None:
+            return True
+        if time.monotonic() - last < settings.query_profile_explain_interval_seconds:
+            return False
+        return random.random() < settings.query_profile_sample_rate
+
+    def _report_slow(self, record: dict, reason: str):
+        record["slow_count"] += 1
+        self.slow_queries += 1
+        plan = (record["explain"] or {}).get("plan", "plan not captured yet")
+        print(f"Slow query {record['fingerprint']} on {record['collection']} ({record['kind']}): {reason}; {plan}")
+
+    async def _explain(self, collection, kind: str, spec, record: dict):
+        try:
+            explain = await run_explain(collection, kind, spec)
+            stats = find_execution_stats(explain) or {}
+            returned = stats.get("nReturned", 0)
+            docs_examined = stats.get("totalDocsExamined", 0)
+            plan = plan_summary(find_winning_plan(explain))
+            record["explain"] = {
+                "plan": plan,
+                "collscan": "COLLSCAN" in plan,
+                "docs_examined": docs_examined,
+                "keys_examined": stats.get("totalKeysExamined", 0),
+                "returned": returned,
+                "scan_ratio": round(docs_examined / max(returned, 1), 1),
+                "execution_ms": stats.get("executionTimeMillis"),
+            }
+            record["explains"] += 1
+            if record["explain"]["scan_ratio"] >= settings.slow_query_scan_ratio:
+                self._report_slow(record, f"examined {docs_examined} docs for {returned} returned")
+        except Exception as e:
+            record["explain"] = {"error": str(e)}
+        finally:
+            self._explains_in_flight -= 1
+
+    def worst(self, limit: int = 20, order_by: str = "max_ms") -> list:
+        def sort_key(record):
+            if order_by == "scan_ratio":
+                return (record["explain"] or {}).get("scan_ratio") or 0
+            if order_by == "avg_ms":
+                return record["total_ms"] / record["count"]
+            return record[order_by]
+
+        records = sorted(self._records.values(), key=sort_key, reverse=True)[:limit]
+        return [{
+            **{k: v for k, v in record.items() if k not in ("total_ms", "last_explain_at", "sample")},
+            "avg_ms": round(record["total_ms"] / record["count"], 3),
+            "max_ms": round(record["max_ms"], 3),
+        } for record in records]
+
+    def samples(self) -> list:
+        """(collection name, kind, spec) of the latest query of every captured shape."""
+        return [(record["collection"], record["kind"], record["sample"]) for record in self._records.values()]
+
+    def reset(self):
+        self._records.clear()
+        self.slow_queries = 0
+
+
+query_profiler = QueryProfiler(max_fingerprints=settings.query_profile_max_fingerprints)
@@ -0,0 +1,110 @@
+# ecommerce_backend/ranking.py
+from typing import Iterable, List, Optional
+from pymongo import UpdateOne
+from bulk_writes import bulk_write_batched
+from config import settings
+from search_cache import search_cache
+
+# Hybrid ranking = relevance_weight * relevance + static_score, where
+#   static_score = popularity_weight * min(1, popularity / popularity_cap)
+#                + price_weight * (1 / price)
+# is query-independent and stored on each product. It is refreshed
+# in batches when popularity is recomputed, for products touched by new
+# orders, when the cache sees a price change, and when the weights change.
+META_COLLECTION = "app_meta"
+STATIC_SCORE_META_ID = "static_score"
+BATCH_SIZE = 1000
+SCORE_FIELDS = {"popularity": 1, "price": 1, "static_score": 1}
+
+
+def ranking_weights() -> dict:
+    return {
+        "relevance": settings.ranking_relevance_weight,
+        "popularity": settings.ranking_popularity_weight,
+        "price": settings.ranking_price_weight,
+        "popularity_cap": settings.ranking_popularity_cap,
+    }
+
+
+def static_score(doc: dict) -> float:
+    popularity = doc.get("popularity") or 0
+    price = doc.get("price") or 0
+    score = settings.ranking_popularity_weight * min(1.0, popularity / settings.ranking_popularity_cap)
+    if price > 0:
+        score += settings.ranking_price_weight / price
+    return score
+
+
+def _static_score_expression() -> dict:
+    # Same formula as static_score(); only used for products not refreshed yet
+    return {"$add": [
+        {"$multiply": [settings.ranking_popularity_weight, {"$min": [
+            1, {"$divide": [{"$ifNull": ["$popularity", 0]}, settings.ranking_popularity_cap]}
+        ]}]},
+        {"$cond": [{"$gt": ["$price", 0]}, {"$divide": [settings.ranking_price_weight, "$price"]}, 0]},
+    ]}
+
+
+def hybrid_score_expression(relevance: dict) -> dict:
+    static = {"$ifNull": ["$static_score", _static_score_expression()]}
+    return {"$add": [{"$multiply": [settings.ranking_relevance_weight, relevance]}, static]}
+
+
+def top_k_stages(sort_fields: list, skip: int, limit: int) -> List[dict]:
+    """$sort directly followed by $limit(skip + limit): the server keeps a bounded
+    top-k heap instead of sorting every match, including inside $facet."""
+    return [{"$sort": dict(sort_fields)}, {"$limit": skip + limit}, {"$skip": skip}]
+
+
+def stale_static_score(doc: dict) -> Optional[float]:
+    """The product's static score if the stored one is missing or out of date."""
+    score = static_score(doc)
+    stored = doc.get("static_score")
+    if stored is None or abs(stored - score) > 1e-12:
+        return score
+    return None
+
+
+async def refresh_static_scores(db, ids: Optional[Iterable] = None, batch_size: int = BATCH_SIZE) -> int:
+    """Recompute static_score for `ids` (or every product), writing only changes."""
+    products = db["products"]
+    query = {"_id": {"$in": list(ids)}} if ids is not None else {}
+
+    async def ops():
+        async for doc in products.find(query, SCORE_FIELDS):
+            score = stale_static_score(doc)
+            if score is not None:
+                yield UpdateOne({"_id": doc["_id"]}, {"$set": {"static_score": score}})
+
+    updated = await bulk_write_batched(products, ops(), batch_size)
+    if ids is None:
+        await db[META_COLLECTION].replace_one(
+            {"_id": STATIC_SCORE_META_ID}, {"_id": STATIC_SCORE_META_ID, "weights": ranking_weights()}, upsert=True
+        )
+    # Incremental refreshes come with popularity changes, which the search
+    # cache already accounts for (note_popularity_change)
+    if updated and ids is None:
+        search_cache.invalidate()
+    return updated
+
+
+async def ensure_static_scores(db) -> int:
+    """Full refresh when the weights changed or some product has no score yet."""
+    meta = await db[META_COLLECTION].find_one({"_id": STATIC_SCORE_META_ID})
+    weights_changed = meta is None or meta.get("weights") != ranking_weights()
+    if not weights_changed and not await db["products"].count_documents({"static_score": {"$exists": False}}, limit=1):
+        return 0
+    updated = await refresh_static_scores(db)
+    print(f"Refreshed static ranking scores on {updated} products")
+    return updated
+
+
+async def _refresh_all(db):
+    updated = await refresh_static_scores(db)
+    print(f"Refreshed static ranking scores on {updated} products")
+
+
+if __name__ == "__main__":
+    from bulk_writes import run_with_database
+
+    run_with_database(_refresh_all)
@@ -0,0 +1,90 @@
+# ecommerce_backend/ratings.py
+from datetime import datetime
+from typing import List
+from pymongo import UpdateOne
+from bulk_writes import bulk_write_batched
+
+# Per-product review aggregates, kept on the product document:
+#   rating_histogram -> {"1": n, ..., "5": n} review counts per star
+#   rating.count / rating.average -> derived from the histogram
+# New reviews bump one histogram bucket and re-derive count/average in the
+# same atomic update; recompute_ratings() rebuilds everything from `reviews`.
+STARS = (1, 2, 3, 4, 5)
+HISTOGRAM_FIELD = "rating_histogram"
+BATCH_SIZE = 1000
+
+
+def empty_histogram() -> dict:
+    return {str(star): 0 for star in STARS}
+
+
+def rating_fields(histogram: dict) -> dict:
+    count = sum(histogram.get(str(star), 0) for star in STARS)
+    weighted = sum(star * histogram.get(str(star), 0) for star in STARS)
+    return {"count": count, "average": weighted / count if count else 0}
+
+
+def _derived_rating() -> dict:
+    # Same as rating_fields(), as an update-pipeline expression
+    counts = [{"$ifNull": [f"${HISTOGRAM_FIELD}.{star}", 0]} for star in STARS]
+    total = {"$add": counts}
+    weighted = {"$add": [{"$multiply": [star, count]} for star, count in zip(STARS, counts)]}
+    return {
+        "rating.count": total,
+        "rating.average": {"$cond": [{"$gt": [total, 0]}, {"$divide": [weighted, total]}, 0]},
+    }
+
+
+def add_rating_update(star: int) -> List[dict]:
+    """Update pipeline counting one more `star` review."""
+    bucket = f"{HISTOGRAM_FIELD}.{star}"
+    return [
+        {"$set": {bucket: {"$add": [{"$ifNull": [f"${bucket}", 0]}, 1]}}},
+        {"$set": _derived_rating()},
+    ]
+
+
+async def record_review(db, product_id, star: int):
+    await db["products"].update_one({"_id": product_id}, add_rating_update(star))
+
+
+async def recompute_ratings(db) -> int:
+    """Rebuild every product's histogram and rating from `reviews` in one pass."""
+    stamp = datetime.utcnow()
+    pipeline = [
+        {"$group": {"_id": {"product_id": "$product_id", "star": "$rating"}, "n": {"$sum": 1}}},
+        {"$group": {"_id": "$_id.product_id", "buckets": {"$push": {"star": "$_id.star", "n": "$n"}}}},
+    ]
+    products = db["products"]
+
+    async def ops():
+        async for row in db["reviews"].aggregate(pipeline, allowDiskUse=True):
+            histogram = empty_histogram()
+            for bucket in row["buckets"]:
+                if bucket["star"] in STARS:
+                    histogram[str(bucket["star"])] = bucket["n"]
+            yield UpdateOne({"_id": row["_id"]}, {"$set": {
+                HISTOGRAM_FIELD: histogram,
+                "rating": rating_fields(histogram),
+                "rating_recomputed_at": stamp,
+            }})
+
+    updated = await bulk_write_batched(products, ops(), BATCH_SIZE)
+
+    # Products without any review
+    await products.update_many(
+        {"rating_recomputed_at": {"$ne": stamp}},
+        {"$set": {
+            HISTOGRAM_FIELD: empty_histogram(),
+            "rating": rating_fields({}),
+            "rating_recomputed_at": stamp,
+        }},
+    )
+    print(f"Recomputed review ratings for {updated} products")
+    return updated
+
+
+if __name__ == "__main__":
+    from bulk_writes import run_with_database
+
+    run_with_database(recompute_ratings)
@@ -0,0 +1,48 @@
+# ecommerce_backend/reviewers.py
+from typing import List
+from pymongo import UpdateMany
+
+# Reviews carry a snapshot of their author's name/email (the ReviewWithUser
+# fields), taken when the review is written, so review pages need no $lookup
+# into users. When a user changes, the snapshot is fanned out to their
+# reviews; user_snapshot_at (the user's updated_at) keeps an older fan-out
+# from overwriting a newer one.
+SNAPSHOT_AT = "user_snapshot_at"
+USER_PROJECTION = {"name": 1, "email": 1, "updated_at": 1}
+BATCH_SIZE = 1000
+
+
+def reviewer_snapshot(user: dict) -> dict:
+    return {"user_name": user.get("name"), "user_email": user.get("email"), SNAPSHOT_AT: user.get("updated_at")}
+
+
+async def fan_out_reviewer_snapshot(db, user: dict) -> int:
+    snapshot = reviewer_snapshot(user)
+    stale: dict = {"user_id": user["_id"], SNAPSHOT_AT: {"$exists": False}}
+    if snapshot[SNAPSHOT_AT] is not None:
+        stale = {"user_id": user["_id"], "$or": [
+            {SNAPSHOT_AT: {"$exists": False}}, {SNAPSHOT_AT: None}, {SNAPSHOT_AT: {"$lt": snapshot[SNAPSHOT_AT]}},
+        ]}
+    result = await db["reviews"].update_many(stale, {"$set": snapshot})
+    return result.modified_count
+
+
+async def backfill_reviewer_snapshots(db, batch_size: int = BATCH_SIZE) -> int:
+    """Embed author snapshots in reviews written without one."""
+    missing = {SNAPSHOT_AT: {"$exists": False}}
+    user_ids = [row["_id"] async for row in db["reviews"].aggregate([
+        {"$match": missing}, {"$group": {"_id": "$user_id"}},
+    ])]
+    updated = 0
+    for start in range(0, len(user_ids), batch_size):
+        chunk = user_ids[start:start + batch_size]
+        users = {doc["_id"]: doc async for doc in db["users"].find({"_id": {"$in": chunk}}, USER_PROJECTION)}
+        # Reviews by unknown users get an empty snapshot so they are not retried
+        ops: List[UpdateMany] = [
+            UpdateMany({"user_id": uid, **missing}, {"$set": reviewer_snapshot(users.get(uid, {}))})
+            for uid in chunk
+        ]
+        result = await db["reviews"].bulk_write(ops, ordered=False)
+        updated += result.modified_count
+    print(f"Backfilled reviewer snapshots on {updated} reviews")
+    return updated
@@ -0,0 +1,157 @@
+# ecommerce_backend/rollups.py
+import heapq
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+from pymongo import ReplaceOne, UpdateOne
+from bulk_writes import bulk_write_batched
+from product_cache import product_cache
+from streaming import iter_batches
+
+# Daily per-product sales aggregates. Analytics sums a window of these rows
+# instead of unwinding every order line in the window on each request. The
+# product category is copied onto each row so category filters apply before
+# any grouping.
+ROLLUPS_COLLECTION = "product_daily_rollups"
+BATCH_SIZE = 1000
+
+
+def day_of(ts: datetime) -> datetime:
+    return datetime(ts.year, ts.month, ts.day)
+
+
+def rollup_ops(orders: Iterable[dict], categories: Dict) -> List[UpdateOne]:
+    totals: dict = {}
+    for order in orders:
+        ts = order.get("timestamp")
+        if ts is None:
+            continue
+        day = day_of(ts)
+        for line in order.get("products") or []:
+            pid = line.get("product_id")
+            if pid is None:
+                continue
+            qty = int(line.get("quantity") or 0)
+            entry = totals.setdefault((pid, day), [0, 0, 0.0])
+            entry[0] += 1
+            entry[1] += qty
+            entry[2] += float(line.get("price_at_purchase") or 0) * qty
+
+    return [
+        UpdateOne(
+            {"_id": {"product_id": pid, "day": day}},
+            {
+                "$inc": {"purchase_count": c, "total_quantity_sold": q, "revenue": r},
+                "$setOnInsert": {"product_id": pid, "day": day, "category": categories.get(pid)},
+            },
+            upsert=True,
+        )
+        for (pid, day), (c, q, r) in totals.items()
+    ]
+
+
+async def product_categories(db, orders: Iterable[dict]) -> Dict:
+    pids = {line.get("product_id") for order in orders for line in order.get("products") or []}
+    pids.discard(None)
+    products = await product_cache.get_many(db["products"], list(pids))
+    return {pid: doc.get("category") for pid, doc in products.items()}
+
+
+async def record_orders(db, orders: Iterable[dict]):
+    """Fold newly written orders into the daily rollups."""
+    orders = list(orders)
+    ops = rollup_ops(orders, await product_categories(db, orders))
+    if ops:
+        await db[ROLLUPS_COLLECTION].bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+async def backfill_rollups(db, since: Optional[datetime] = None):
+    """Rebuild rollup rows from `orders`, for everything or from `since` on."""
+    rollups_col = db[ROLLUPS_COLLECTION]
+    order_match: dict = {}
+    if since is not None:
+        since = day_of(since)
+        order_match["timestamp"] = {"$gte": since}
+        await rollups_col.delete_many({"day": {"$gte": since}})
+    else:
+        await rollups_col.delete_many({})
+
+    pipeline = [
+        {"$match": order_match},
+        {"$unwind": "$products"},
+        {"$group": {
+            "_id": {
+                "product_id": "$products.product_id",
+                "day": {"$dateFromParts": {
+                    "year": {"$year": "$timestamp"},
+                    "month": {"$month": "$timestamp"},
+                    "day": {"$dayOfMonth": "$timestamp"},
+                }},
+            },
+            "purchase_count": {"$sum": 1},
+            "total_quantity_sold": {"$sum": "$products.quantity"},
+            "revenue": {"$sum": {"$multiply": ["$products.price_at_purchase", "$products.quantity"]}},
+        }},
+    ]
+
+    async def ops():
+        # Categories are looked up once per batch of rows
+        async for rows in iter_batches(db["orders"].aggregate(pipeline, allowDiskUse=True), BATCH_SIZE):
+            pids = list({row["_id"]["product_id"] for row in rows})
+            products = await product_cache.get_many(db["products"], pids)
+            for row in rows:
+                row["product_id"] = row["_id"]["product_id"]
+                row["day"] = row["_id"]["day"]
+                row["category"] = (products.get(row["product_id"]) or {}).get("category")
+                yield ReplaceOne({"_id": row["_id"]}, row, upsert=True)
+
+    written = await bulk_write_batched(rollups_col, ops(), BATCH_SIZE)
+    print(f"Backfilled {written} daily product rollups")
+    return written
+
+
+def top_products_pipeline(since: datetime, category: Optional[str] = None) -> List[dict]:
+    match: dict = {"day": {"$gte": day_of(since)}}
+    if category:
+        match["category"] = category
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": "$product_id",
+            "category": {"$first": "$category"},
+            "purchase_count": {"$sum": "$purchase_count"},
+            "total_quantity_sold": {"$sum": "$total_quantity_sold"},
+            "revenue": {"$sum": "$revenue"},
+        }},
+    ]
+
+
+async def top_k_per_category(rows, k: int) -> Dict[Optional[str], List[dict]]:
+    """Single pass over grouped rollup rows keeping a k-sized heap per category."""
+    heaps: Dict[Optional[str], list] = {}
+    seq = 0
+    async for row in rows:
+        heap = heaps.setdefault(row.get("category"), [])
+        # seq keeps the tuples comparable and favours earlier rows on ties
+        item = (row["purchase_count"], -seq, row)
+        seq += 1
+        if len(heap) < k:
+            heapq.heappush(heap, item)
+        elif item[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, item)
+    return {
+        category: [row for _, _, row in sorted(heap, key=lambda it: it[:2], reverse=True)]
+        for category, heap in heaps.items()
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+    from bulk_writes import run_with_database
+
+    parser = argparse.ArgumentParser(description="Backfill daily product rollups from orders")
+    parser.add_argument("--days", type=int, default=None, help="Only rebuild the last N days")
+    args = parser.parse_args()
+
+    since = datetime.utcnow() - timedelta(days=args.days) if args.days else None
+    run_with_database(lambda db: backfill_rollups(db, since))
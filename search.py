@@ -0,0 +1,258 @@
+# ecommerce_backend/search.py
+import asyncio
+import time
+from typing import Iterator, List, Optional, Tuple
+from config import settings
+from facets import filter_clause
+from fuzzy_index import fuzzy_index
+from metrics import search_phase_timeouts
+from pagination import InvalidCursor, decode_cursor, encode_cursor, seek_filter
+from query_profiler import query_profiler
+from ranking import hybrid_score_expression, top_k_stages
+
+# Pipeline building for /products/search and its faceted variant. A query runs
+# in phases: a $text pass (queries of 3+ characters) and, when that finds
+# nothing, a fuzzy pass over trigram-index candidates.
+#
+# Hybrid-ranked search goes through candidates() first: each pass returns only
+# (_id, relevance) within its own latency budget, and only the winning pass's
+# candidates are fetched and ranked (enrich_pipeline). The text pass keeps the
+# top TEXT_CANDIDATE_LIMIT matches by textScore (at least skip + limit), so a
+# first page ranks only those. Explicit sorts (price, popularity, rating) and
+# cursor pages order every match instead (sorted_page).
+
+SEARCH_PROJECTION = {
+    "_id": 1, "name": 1, "description": 1, "category": 1,
+    "price": 1, "brand": 1, "rating": 1, "stock": 1,
+    "created_at": 1, "updated_at": 1,
+    "score": {"$ifNull": ["$hybrid_score", 0]},
+}
+
+SORT_FIELDS = {
+    "price_asc": [("price", 1), ("_id", 1)],
+    "price_desc": [("price", -1), ("_id", 1)],
+    "popularity": [("popularity", -1), ("_id", 1)],
+    "rating": [("rating.average", -1), ("_id", 1)],
+}
+HYBRID_SORT = [("hybrid_score", -1), ("_id", 1)]
+
+
+def normalize_sort(sort_by: Optional[str]) -> Optional[str]:
+    """Map free-form sort_by values to a sort key; None means hybrid ranking."""
+    if not sort_by:
+        return None
+    s = str(sort_by).strip().lower().replace('-', ' ').replace('_', ' ')
+    if s in {"price asc", "price low", "price low to high", "price_asc"}:
+        return "price_asc"
+    if s in {"price desc", "price high", "price high to low", "price_desc"}:
+        return "price_desc"
+    if s in {"popularity", "popular"}:
+        return "popularity"
+    if s in {"rating", "ratings"}:
+        return "rating"
+    return None
+
+
+def search_filters(min_price, max_price, category, brand, filter_mode: str) -> dict:
+    filters: dict = {}
+    if min_price is not None:
+        filters["price"] = {"$gte": min_price}
+    if max_price is not None:
+        filters.setdefault("price", {})["$lte"] = max_price
+    if category:
+        filters.update(filter_clause("category", category, filter_mode))
+    if brand:
+        filters.update(filter_clause("brand", brand, filter_mode))
+    return filters
+
+
+def _candidate_match(candidates: List[Tuple]) -> Tuple[dict, dict]:
+    """$match on candidate ids and their relevance looked up by position."""
+    candidate_ids = [pid for pid, _ in candidates]
+    scores = [score for _, score in candidates]
+    relevance = {"$arrayElemAt": [scores, {"$indexOfArray": [candidate_ids, "$_id"]}]}
+    return {"_id": {"$in": candidate_ids}}, relevance
+
+
+async def _within_budget(phase: str, coro, budget_ms: float) -> Tuple[List[Tuple], bool]:
+    """(results, timed out); a pass cut off by its budget returns no results."""
+    if not budget_ms:
+        return await coro, False
+    try:
+        return await asyncio.wait_for(coro, budget_ms / 1000), False
+    except asyncio.TimeoutError:
+        search_phase_timeouts.inc((phase,))
+        print(f"Search {phase} pass cut off after {budget_ms:.0f} ms")
+        return [], True
+
+
+def _count_by(field: str) -> List[dict]:
+    return [{"$group": {"_id": field, "count": {"$sum": 1}}}, {"$sort": {"count": -1, "_id": 1}}]
+
+
+class SearchQuery:
+    """One search request: filters, ordering and the page position.
+
+    Cursors are [phase, sort value, _id]; the phase pins later pages to the
+    pass (text or fuzzy) that produced the first one. Raises InvalidCursor for
+    a token from another sort.
+    """
+
+    def __init__(self, q: str, filters: dict, sort: Optional[str], limit: int, skip: int = 0,
+                 cursor: Optional[str] = None):
+        self.q = q
+        self.filters = filters
+        self.sort = sort
+        self.limit = limit
+        self.skip = skip
+        self.sort_fields = SORT_FIELDS.get(sort, HYBRID_SORT)
+        self.cursor_kind = f"search:{sort or 'hybrid'}"
+        self.seek_phase, self.seek_values = None, None
+        if cursor:
+            # [phase, *sort values]
+            self.seek_phase, *self.seek_values = decode_cursor(cursor, self.cursor_kind, 1 + len(self.sort_fields))
+            if self.seek_phase not in ("text", "fuzzy"):
+                raise InvalidCursor("Malformed cursor")
+
+    def phases(self) -> Iterator[Tuple[str, dict, dict]]:
+        """(phase, $match, relevance expression) for each pass, in order."""
+        if len(self.q) >= 3 and self.seek_phase in (None, "text"):
+            yield "text", {"$text": {"$search": self.q}, **self.filters}, {"$meta": "textScore"}
+        if self.seek_phase in (None, "fuzzy"):
+            # Typo-tolerant fallback: candidates come ranked from the trigram index
+            candidates = fuzzy_index.search(self.q, limit=settings.fuzzy_candidate_limit)
+            if candidates:
+                match, relevance = _candidate_match(candidates)
+                yield "fuzzy", {**match, **self.filters}, relevance
+
+    def _runs(self, phase: str) -> bool:
+        if self.seek_phase not in (None, phase):
+            return False
+        return phase != "text" or len(self.q) >= 3
+
+    def uses_candidates(self) -> bool:
+        """Whether this page is ranked from capped candidates (see candidates())."""
+        return not self.sort and self.seek_values is None
+
+    def text_candidate_limit(self) -> int:
+        # Deep skip pages still see skip + limit candidates
+        return max(settings.text_candidate_limit, self.skip + self.limit)
+
+    def text_candidate_pipeline(self) -> List[dict]:
+        """Top text matches by textScore, the candidates for a hybrid-ranked page."""
+        return [
+            {"$match": {"$text": {"$search": self.q}, **self.filters}},
+            {"$sort": {"relevance": {"$meta": "textScore"}}},
+            {"$limit": self.text_candidate_limit()},
+            {"$project": {"_id": 1, "relevance": {"$meta": "textScore"}}},
+        ]
+
+    async def _text_candidates(self, collection) -> List[Tuple]:
+        pipeline = self.text_candidate_pipeline()
+        with query_profiler.track(collection, "aggregate", pipeline):
+            return [(doc["_id"], doc["relevance"]) async for doc in collection.aggregate(pipeline)]
+
+    async def _fuzzy_candidates(self, collection, budget_ms: float) -> List[Tuple]:
+        deadline = time.monotonic() + budget_ms / 1000 if budget_ms else None
+        candidates = fuzzy_index.search(self.q, limit=settings.fuzzy_candidate_limit, deadline=deadline)
+        if candidates and self.filters:
+            # The trigram index knows nothing about price/category/brand
+            spec = {"filter": {"_id": {"$in": [pid for pid, _ in candidates]}, **self.filters}}
+            with query_profiler.track(collection, "find", spec):
+                keep = {doc["_id"] async for doc in collection.find(spec["filter"], {"_id": 1})}
+            candidates = [(pid, sim) for pid, sim in candidates if pid in keep]
+        return candidates
+
+    async def candidates(self, collection) -> Tuple[Optional[str], List[Tuple], bool]:
+        """(phase, [(_id, relevance)], timed out) from the first pass with results.
+
+        The fuzzy pass only starts once the $text pass comes back empty, so
+        queries with text hits never pay for it. A pass cut off by its budget
+        ends the search with timed out set instead of falling through, and its
+        result should not be cached.
+        """
+        if self._runs("text"):
+            found, timed_out = await _within_budget(
+                "text", self._text_candidates(collection), settings.search_text_budget_ms
+            )
+            if found or timed_out:
+                return "text", found, timed_out
+        if self._runs("fuzzy"):
+            budget = settings.search_fuzzy_budget_ms
+            found, timed_out = await _within_budget("fuzzy", self._fuzzy_candidates(collection, budget), budget)
+            if found or timed_out:
+                return "fuzzy", found, timed_out
+        return None, [], False
+
+    async def sorted_page(self, collection) -> Tuple[Optional[str], List[dict]]:
+        """(phase, page) ordered over every match of the first pass with any.
+
+        Used for explicit sorts and for cursor pages, whose position in the
+        hybrid order may lie past the candidate cap.
+        """
+        for phase, match, relevance in self.phases():
+            pipeline = self.pipeline(match, relevance)
+            with query_profiler.track(collection, "aggregate", pipeline):
+                docs = [doc async for doc in collection.aggregate(pipeline)]
+            # An empty page past the end of this pass's matches still belongs to it
+            if docs or await collection.find_one(match, {"_id": 1}):
+                return phase, docs
+        return None, []
+
+    def enrich_pipeline(self, candidates: List[Tuple]) -> List[dict]:
+        """Fetch, score and page only the candidate products."""
+        return self.pipeline(*_candidate_match(candidates))
+
+    def _page_stages(self, relevance: dict) -> List[dict]:
+        stages = []
+        if not self.sort:
+            # One multiply-add per match; the query-independent part is precomputed
+            stages.append({"$addFields": {"hybrid_score": hybrid_score_expression(relevance)}})
+        if self.seek_values is not None:
+            stages.append({"$match": seek_filter(self.sort_fields, self.seek_values)})
+        stages.extend(top_k_stages(self.sort_fields, self.skip if self.seek_values is None else 0, self.limit))
+        stages.append({"$project": {**SEARCH_PROJECTION, "sort_key": "$" + self.sort_fields[0][0]}})
+        return stages
+
+    def pipeline(self, match: dict, relevance: dict) -> List[dict]:
+        return [{"$match": match}, *self._page_stages(relevance)]
+
+    def faceted_pipeline(self, match: dict, relevance: dict, price_boundaries: List[float]) -> List[dict]:
+        """Match once, then the ranked page and category/brand/price counts side by side."""
+        bucket = {"groupBy": "$price", "boundaries": price_boundaries, "default": "other"}
+        return [
+            {"$match": match},
+            {"$facet": {
+                "items": self._page_stages(relevance),
+                "category": _count_by("$category"),
+                "brand": _count_by("$brand"),
+                "price": [{"$bucket": {**bucket, "output": {"count": {"$sum": 1}}}}],
+                "total": [{"$count": "count"}],
+            }},
+        ]
+
+    def page(self, docs: List[dict], phase: str) -> Tuple[List[dict], Optional[str]]:
+        """Strip sort keys and build the continuation token for a full page."""
+        token = None
+        if len(docs) == self.limit:
+            last = docs[-1]
+            token = encode_cursor(self.cursor_kind, [phase, last["sort_key"], last["_id"]])
+        for doc in docs:
+            doc.pop("sort_key", None)
+        return docs, token
+
+
+def price_facets(rows: List[dict], boundaries: List[float]) -> List[dict]:
+    counts = {row["_id"]: row["count"] for row in rows}
+    buckets = [
+        {"min": low, "max": high, "count": counts.get(low, 0)}
+        for low, high in zip(boundaries, boundaries[1:])
+    ]
+    if counts.get("other"):
+        # Prices outside the configured boundaries
+        buckets.append({"min": None, "max": None, "count": counts["other"]})
+    return buckets
+
+
+def value_facets(rows: List[dict]) -> List[dict]:
+    return [{"value": row["_id"], "count": row["count"]} for row in rows if row["_id"] is not None]
@@ -0,0 +1,147 @@
+# ecommerce_backend/search_cache.py
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Set
+from config import settings
+
+
+class Computed:
+    """A computed value with the products it lists, so their changes can evict it.
+
+    store=False hands the value to its waiters without caching it, e.g. for
+    a search cut short by its time budget.
+    """
+
+    def __init__(self, value, product_ids: Iterable = (), store: bool = True):
+        self.value = value
+        self.product_ids = frozenset(product_ids)
+        self.store = store
+
+
+class SearchCache:
+    """Bounded LRU + TTL cache for search results with single-flight misses.
+
+    Concurrent requests for the same key while a computation is running wait
+    on that computation instead of starting their own. Results computed across
+    an invalidation, or showing a product evicted meanwhile, are handed to
+    their waiters but not stored. A computation keeps running if the request
+    that started it is cancelled.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, popularity_threshold: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.popularity_threshold = popularity_threshold
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._inflight: dict = {}
+        self._generation = 0
+        # Product evictions seen while computations were in flight
+        self._change_seq = 0
+        self._changed_at: Dict[Any, int] = {}
+        self._stale_inflight: Set[Hashable] = set()
+        self._popularity_delta = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.product_evictions = 0
+        self.invalidations = 0
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]]):
+        if self.max_entries <= 0:
+            value = await compute()
+            return value.value if isinstance(value, Computed) else value
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._entries[key]
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        self.misses += 1
+        # The computation runs as its own task so a cancelled first caller
+        # does not cancel it for the requests waiting on the same key
+        task = asyncio.ensure_future(self._compute(key, compute, self._generation, self._change_seq))
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())  # retrieved even with no waiter left
+        self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: Hashable, compute: Callable[[], Awaitable[Any]], generation: int, seq: int):
+        try:
+            value = await compute()
+        finally:
+            self._inflight.pop(key, None)
+            stale = key in self._stale_inflight
+            self._stale_inflight.discard(key)
+        computed = value if isinstance(value, Computed) else Computed(value)
+        if computed.store and not stale and generation == self._generation and not any(
+            self._changed_at.get(pid, 0) > seq for pid in computed.product_ids
+        ):
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, computed.value, computed.product_ids)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        if not self._inflight:
+            self._changed_at.clear()
+        return computed.value
+
+    def evict_products(self, product_ids: Iterable, where: Optional[Callable[[Hashable], bool]] = None):
+        """Drop entries listing any of `product_ids`, and entries whose key matches `where`."""
+        changed = set(product_ids)
+        stale = [
+            key for key, (_, _, shown) in self._entries.items()
+            if not changed.isdisjoint(shown) or (where is not None and where(key))
+        ]
+        for key in stale:
+            del self._entries[key]
+        self.product_evictions += len(stale)
+        if not self._inflight:
+            self._changed_at.clear()
+            return
+        self._change_seq += 1
+        for pid in changed:
+            self._changed_at[pid] = self._change_seq
+        if where is not None:
+            self._stale_inflight.update(key for key in self._inflight if where(key))
+
+    def invalidate(self):
+        self._entries.clear()
+        self._generation += 1
+        self._popularity_delta = 0
+        self.invalidations += 1
+
+    def note_popularity_change(self, delta: int):
+        # Small counter drifts barely move the ranking; only flush once they add up
+        self._popularity_delta += delta
+        if self._popularity_delta >= self.popularity_threshold:
+            self.invalidate()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "product_evictions": self.product_evictions,
+            "invalidations": self.invalidations,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+
+search_cache = SearchCache(
+    max_entries=settings.search_cache_max_entries,
+    ttl_seconds=settings.search_cache_ttl_seconds,
+    popularity_threshold=settings.search_cache_popularity_threshold,
+)
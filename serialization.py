@@ -0,0 +1,77 @@
+# ecommerce_backend/serialization.py
+from typing import Any, Dict, List, Tuple, Type
+import orjson
+from bson import ObjectId
+from fastapi import Response
+from pydantic import BaseModel
+from pydantic_core import PydanticUndefined
+from config import settings
+from metrics import span
+
+# Trusted-output fast path. Documents read from our own collections already
+# have the right types, so instead of building Pydantic models and letting
+# FastAPI validate them again against response_model, they are trimmed to the
+# model's fields and encoded straight to JSON bytes. response_model stays on
+# the routes, so the OpenAPI schema is unchanged.
+
+_ORJSON_OPTIONS = orjson.OPT_UTC_Z
+
+
+def _default(value: Any):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(by_alias=True)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+
+
+_shapes: Dict[Type[BaseModel], List[Tuple[str, Any]]] = {}
+
+
+def _shape_of(model: Type[BaseModel]) -> List[Tuple[str, Any]]:
+    shape = _shapes.get(model)
+    if shape is None:
+        shape = []
+        for name, field in model.model_fields.items():
+            if field.default_factory is not None:
+                default = field.default_factory()
+                if isinstance(default, BaseModel):
+                    default = default.model_dump(by_alias=True)
+            else:
+                default = None if field.default is PydanticUndefined else field.default
+            shape.append((field.alias or name, default))
+        _shapes[model] = shape
+    return shape
+
+
+def shape_document(doc: dict, model: Type[BaseModel]) -> dict:
+    """Keep only the model's top-level fields (by alias), filling defaults."""
+    return {key: doc.get(key, default) for key, default in _shape_of(model)}
+
+
+def build_item(doc: dict, model: Type[BaseModel]):
+    if settings.trusted_output:
+        return shape_document(doc, model)
+    return model(**doc)
+
+
+def serialize_item(item: Any) -> bytes:
+    if isinstance(item, BaseModel):
+        return item.model_dump_json(by_alias=True).encode()
+    return dumps(item)
+
+
+def render(content: Any, response: Response):
+    """Return trusted content as pre-encoded JSON, carrying over headers set on `response`."""
+    if settings.trusted_output:
+        with span("serialize"):
+            body = dumps(content)
+        return Response(
+            content=body, media_type="application/json",
+            status_code=response.status_code or 200, headers=dict(response.headers),
+        )
+    return content
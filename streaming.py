@@ -0,0 +1,80 @@
+# ecommerce_backend/streaming.py
+from typing import Any, AsyncIterable, Callable, Iterable, Optional, Union
+from fastapi import Query, Request
+from fastapi.responses import StreamingResponse
+from serialization import serialize_item
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+JSON_MEDIA_TYPE = "application/json"
+# Serialized bytes are flushed to the socket once this much has accumulated
+CHUNK_SIZE = 64 * 1024
+
+
+def stream_format(
+    request: Request,
+    stream: Optional[str] = Query(
+        None, pattern="^(ndjson|json)$",
+        description="Stream the listing as NDJSON or a chunked JSON array (no X-Next-Cursor header)"
+    ),
+) -> Optional[str]:
+    """Dependency picking a streaming format from ?stream= or the Accept header."""
+    if stream:
+        return stream
+    if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+        return "ndjson"
+    return None
+
+
+async def _aiter(items: Union[Iterable, AsyncIterable]):
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def iter_batches(cursor, size: int):
+    """Group an async cursor into lists of up to `size` documents."""
+    batch = []
+    async for doc in cursor:
+        batch.append(doc)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def iter_json(items, fmt: str, serialize: Callable[[Any], bytes] = serialize_item, chunk_size: int = CHUNK_SIZE):
+    """Serialize items one at a time into byte chunks of roughly `chunk_size`."""
+    ndjson = fmt == "ndjson"
+    buffer = bytearray() if ndjson else bytearray(b"[")
+    first = True
+    try:
+        async for item in _aiter(items):
+            if ndjson:
+                buffer += serialize(item)
+                buffer += b"\n"
+            else:
+                if not first:
+                    buffer += b","
+                buffer += serialize(item)
+            first = False
+            if len(buffer) >= chunk_size:
+                yield bytes(buffer)
+                buffer.clear()
+    except Exception as e:
+        # Headers are already sent; re-raising makes the server abort the
+        # chunked body, so the client sees a failed transfer, not a short list
+        print(f"Streaming response aborted: {e}")
+        raise
+    if not ndjson:
+        buffer += b"]"
+    if buffer:
+        yield bytes(buffer)
+
+
+def streaming_response(items, fmt: str, serialize: Callable[[Any], bytes] = serialize_item) -> StreamingResponse:
+    media_type = NDJSON_MEDIA_TYPE if fmt == "ndjson" else JSON_MEDIA_TYPE
+    return StreamingResponse(iter_json(items, fmt, serialize), media_type=media_type)
@@ -0,0 +1,117 @@
+# test_bulk_loader.py
+import asyncio
+import json
+import os
+from datetime import datetime, timezone
+import mongomock_motor
+import pytest
+from bson import ObjectId
+from benchmarks import mongomock_compat
+import bulk_loader
+from bulk_loader import bulk_load, checkpoint_path_for, iter_documents
+
+mongomock_compat.install()
+
+
+def make_docs(n):
+    return [
+        {
+            "_id": ObjectId(),
+            "name": f"Product \"{i}\" with a longer name, {{braces}} and [brackets]",
+            "price": i + 0.25,
+            "tags": ["a", "b", i],
+            "created_at": datetime(2024, 1, 1 + i % 28, tzinfo=timezone.utc),
+        }
+        for i in range(n)
+    ]
+
+
+def extended(doc):
+    return {
+        **doc,
+        "_id": {"$oid": str(doc["_id"])},
+        "created_at": {"$date": doc["created_at"].isoformat().replace("+00:00", "Z")},
+    }
+
+
+def write_array(path, docs, indent=None):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump([extended(doc) for doc in docs], f, indent=indent)
+
+
+def write_ndjson(path, docs):
+    with open(path, "w", encoding="utf-8") as f:
+        for doc in docs:
+            f.write(json.dumps(extended(doc)) + "\n")
+
+
+@pytest.mark.parametrize("writer", [write_array, write_ndjson])
+def test_round_trip(tmp_path, writer):
+    docs = make_docs(25)
+    path = tmp_path / "docs.json"
+    writer(path, docs)
+    assert list(iter_documents(str(path))) == docs
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64])
+@pytest.mark.parametrize("writer", [write_array, write_ndjson])
+def test_chunk_boundaries_inside_tokens(tmp_path, monkeypatch, writer, chunk_size):
+    monkeypatch.setattr(bulk_loader, "READ_CHUNK_SIZE", chunk_size)
+    docs = make_docs(10)
+    path = tmp_path / "docs.json"
+    writer(path, docs)
+    assert list(iter_documents(str(path))) == docs
+
+
+@pytest.mark.parametrize("writer", [write_array, write_ndjson])
+def test_whitespace_only_first_chunk(tmp_path, monkeypatch, writer):
+    monkeypatch.setattr(bulk_loader, "READ_CHUNK_SIZE", 16)
+    docs = make_docs(3)
+    path = tmp_path / "docs.json"
+    writer(path, docs)
+    body = path.read_text(encoding="utf-8")
+    path.write_text(" \n\t" * 20 + body, encoding="utf-8")
+    assert list(iter_documents(str(path))) == docs
+
+
+def test_truncated_array_raises(tmp_path):
+    path = tmp_path / "docs.json"
+    write_array(path, make_docs(3))
+    body = path.read_text(encoding="utf-8")
+    path.write_text(body[:-10], encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(iter_documents(str(path)))
+
+
+def test_resume_after_interrupt(tmp_path, monkeypatch):
+    docs = make_docs(50)
+    path = tmp_path / "products.json"
+    write_array(path, docs, indent=1)
+    collection = mongomock_motor.AsyncMongoMockClient()["bulk_loader_test"]["products"]
+    insert_batch = bulk_loader._insert_batch
+    calls = {"n": 0}
+
+    async def interrupted_insert_batch(collection, batch):
+        calls["n"] += 1
+        if calls["n"] == 3:
+            raise RuntimeError("connection lost")
+        await insert_batch(collection, batch)
+    monkeypatch.setattr(bulk_loader, "_insert_batch", interrupted_insert_batch)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(bulk_load(collection, str(path), batch_size=10, concurrency=1, progress_interval=0))
+    checkpoint = checkpoint_path_for(str(path), "products")
+    with open(checkpoint, encoding="utf-8") as f:
+        assert json.load(f)["committed"] == 20
+
+    # A checkpoint that lags the data re-sends documents that are already stored
+    with open(checkpoint, "w", encoding="utf-8") as f:
+        json.dump({"committed": 10}, f)
+    monkeypatch.setattr(bulk_loader, "_insert_batch", insert_batch)
+    inserted, _ = asyncio.run(bulk_load(collection, str(path), batch_size=10, concurrency=2))
+    assert inserted == 40
+    assert not os.path.exists(checkpoint)
+
+    async def stored_ids():
+        return [doc["_id"] async for doc in collection.find({}, {"_id": 1}).sort("price", 1)]
+    assert asyncio.run(stored_ids()) == [doc["_id"] for doc in docs]
@@ -0,0 +1,45 @@
+# test_bulk_writes.py
+import asyncio
+import mongomock_motor
+from pymongo import InsertOne
+from benchmarks import mongomock_compat
+from bulk_writes import bulk_write_batched
+
+mongomock_compat.install()
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class CountingCollection:
+    def __init__(self, collection):
+        self.collection = collection
+        self.batches = []
+
+    async def bulk_write(self, ops, ordered=True):
+        self.batches.append(len(ops))
+        return await self.collection.bulk_write(ops, ordered=ordered)
+
+
+async def _ops(n):
+    for i in range(n):
+        yield InsertOne({"_id": i})
+
+
+def test_bulk_write_batched_splits_into_batches():
+    async def scenario():
+        collection = mongomock_motor.AsyncMongoMockClient()["bulk_writes_test"]["docs"]
+        counting = CountingCollection(collection)
+        written = await bulk_write_batched(counting, _ops(7), batch_size=3)
+        return written, counting.batches, await collection.count_documents({})
+
+    assert run(scenario()) == (7, [3, 3, 1], 7)
+
+
+def test_bulk_write_batched_skips_empty_input():
+    async def scenario():
+        counting = CountingCollection(mongomock_motor.AsyncMongoMockClient()["bulk_writes_test"]["docs"])
+        return await bulk_write_batched(counting, _ops(0), batch_size=3), counting.batches
+
+    assert run(scenario()) == (0, [])
@@ -0,0 +1,61 @@
+# test_fuzzy_index.py
+import asyncio
+from datetime import datetime
+from bson import ObjectId
+from fuzzy_index import TrigramIndex, tokenize
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_tokenize_keeps_non_ascii_words():
+    assert tokenize("Crème Brûlée Löffel") == ["crème", "brûlée", "löffel"]
+    assert tokenize("東京 タワー") == ["東京", "タワー"]
+
+
+def test_non_ascii_names_are_searchable():
+    index = TrigramIndex()
+    pid = ObjectId()
+    index.add_product({"_id": pid, "name": "Müsli Schüssel"})
+    assert index.search("müsli")[0][0] == pid
+    assert index.search("schüsel")[0][0] == pid
+
+
+def test_incremental_changes_are_saved_to_the_snapshot(tmp_path):
+    path = str(tmp_path / "fuzzy.json.gz")
+    index = TrigramIndex(save_delay=0.01)
+    first = {"_id": ObjectId(), "name": "Desk Lamp", "updated_at": datetime(2026, 1, 1)}
+    second = {"_id": ObjectId(), "name": "Floor Lamp", "updated_at": datetime(2026, 1, 2)}
+    index.add_product(first)
+    index.ready = True
+    index.path = path
+    index.save(path)
+
+    async def scenario():
+        index.add_product(second)
+        index.schedule_save()
+        await asyncio.sleep(0.05)
+        await index.flush()
+
+    run(scenario())
+    restored = TrigramIndex()
+    assert restored.load(path)
+    assert len(restored) == 2
+    assert restored.max_updated_at == second["updated_at"]
+
+
+def test_flush_writes_a_pending_save_immediately(tmp_path):
+    path = str(tmp_path / "fuzzy.json.gz")
+    index = TrigramIndex(save_delay=3600)
+    index.ready = True
+    index.path = path
+
+    async def scenario():
+        index.add_product({"_id": ObjectId(), "name": "Desk Lamp"})
+        index.schedule_save()
+        await index.flush()
+
+    run(scenario())
+    restored = TrigramIndex()
+    assert restored.load(path) and len(restored) == 1
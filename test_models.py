@@ -0,0 +1,16 @@
+# test_models.py
+import pytest
+from pydantic import ValidationError
+from models import UserUpdate
+
+
+@pytest.mark.parametrize("field", ["name", "email"])
+def test_user_update_rejects_null_required_fields(field):
+    with pytest.raises(ValidationError):
+        UserUpdate.model_validate({field: None})
+
+
+def test_user_update_keeps_only_set_fields():
+    update = UserUpdate.model_validate({"name": "Ada", "location": None})
+    assert update.model_dump(exclude_unset=True) == {"name": "Ada", "location": None}
+    assert UserUpdate.model_validate({}).model_dump(exclude_unset=True) == {}
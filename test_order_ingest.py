@@ -0,0 +1,113 @@
+# test_order_ingest.py
+import asyncio
+import mongomock_motor
+import pytest
+from bson import ObjectId
+from benchmarks import mongomock_compat
+import order_ingest
+from order_ingest import INSUFFICIENT_STOCK, OrderRejected, OrderWriter
+
+mongomock_compat.install()
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def setup_db(stocks):
+    db = mongomock_motor.AsyncMongoMockClient()["order_ingest_test"]
+    user_id = ObjectId()
+    await db["users"].insert_one({"_id": user_id, "name": "Ada", "email": "ada@example.com"})
+    pids = []
+    for i, stock in enumerate(stocks):
+        pid = ObjectId()
+        await db["products"].insert_one({
+            "_id": pid, "name": f"Product {i}", "category": "Tools", "price": 10.0, "stock": stock,
+        })
+        pids.append(pid)
+    return db, user_id, pids
+
+
+def order(user_id, *lines):
+    return {"user_id": user_id, "products": [{"product_id": pid, "quantity": qty} for pid, qty in lines]}
+
+
+async def stock_of(db, pid):
+    return (await db["products"].find_one({"_id": pid}))["stock"]
+
+
+def test_contended_reservation_rejects_only_orders_on_lost_products(monkeypatch):
+    async def scenario():
+        db, user_id, (a, b) = await setup_db([5, 5])
+        reserve = OrderWriter._reserve_stock
+
+        async def racing_reserve(products_col, reserved):
+            # Another writer takes most of A between the read and the decrement
+            await products_col.update_one({"_id": a}, {"$inc": {"stock": -4}})
+            return await reserve(products_col, reserved)
+        monkeypatch.setattr(OrderWriter, "_reserve_stock", staticmethod(racing_reserve))
+
+        writer = OrderWriter(window_ms=1, max_batch=10)
+        first, second = await writer.submit(db, [order(user_id, (a, 2), (b, 1)), order(user_id, (b, 2))])
+        assert isinstance(first, OrderRejected) and first.status == INSUFFICIENT_STOCK
+        assert not isinstance(second, OrderRejected)
+        assert await stock_of(db, a) == 1
+        assert await stock_of(db, b) == 3
+        assert await db["orders"].count_documents({}) == 1
+    run(scenario())
+
+
+def test_reservation_error_releases_applied_decrements(monkeypatch):
+    async def scenario():
+        db, user_id, (a, b) = await setup_db([5, 5])
+        update_one = mongomock_motor.AsyncMongoMockCollection.update_one
+
+        async def flaky_update_one(self, query, *args, **kwargs):
+            if query.get("_id") == b:
+                raise RuntimeError("connection reset")
+            return await update_one(self, query, *args, **kwargs)
+        monkeypatch.setattr(mongomock_motor.AsyncMongoMockCollection, "update_one", flaky_update_one)
+
+        writer = OrderWriter(window_ms=1, max_batch=10)
+        with pytest.raises(RuntimeError):
+            await writer.submit(db, [order(user_id, (a, 2), (b, 1))])
+        assert await stock_of(db, a) == 5
+        assert await stock_of(db, b) == 5
+        assert await db["orders"].count_documents({}) == 0
+    run(scenario())
+
+
+def test_insert_failure_gives_stock_back(monkeypatch):
+    async def scenario():
+        db, user_id, (a, b) = await setup_db([5, 5])
+        insert_many = mongomock_motor.AsyncMongoMockCollection.insert_many
+
+        async def partial_insert_many(self, documents, *args, **kwargs):
+            # The first document lands, then the batch fails
+            await insert_many(self, documents[:1], *args, **kwargs)
+            raise RuntimeError("write concern timeout")
+        monkeypatch.setattr(mongomock_motor.AsyncMongoMockCollection, "insert_many", partial_insert_many)
+
+        writer = OrderWriter(window_ms=1, max_batch=10)
+        with pytest.raises(RuntimeError):
+            await writer.submit(db, [order(user_id, (a, 2)), order(user_id, (a, 1), (b, 3))])
+        assert await stock_of(db, a) == 5
+        assert await stock_of(db, b) == 5
+        assert await db["orders"].count_documents({}) == 0
+    run(scenario())
+
+
+def test_counter_failure_undoes_the_flush(monkeypatch):
+    async def scenario():
+        db, user_id, (a,) = await setup_db([5])
+
+        async def failing_record_orders(db, orders):
+            raise RuntimeError("popularity write failed")
+        monkeypatch.setattr(order_ingest.popularity, "record_orders", failing_record_orders)
+
+        writer = OrderWriter(window_ms=1, max_batch=10)
+        with pytest.raises(RuntimeError):
+            await writer.submit(db, [order(user_id, (a, 2))])
+        assert await stock_of(db, a) == 5
+        assert await db["orders"].count_documents({}) == 0
+    run(scenario())
@@ -0,0 +1,54 @@
+# test_pagination.py
+import base64
+import json
+from datetime import datetime
+import pytest
+from bson import ObjectId
+from pagination import REVIEWS_SORT, InvalidCursor, decode_cursor, encode_cursor, seek_filter
+from search import HYBRID_SORT, SearchQuery
+
+
+def raw_token(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+
+
+def test_round_trip():
+    values = [datetime(2024, 5, 1, 12, 30), ObjectId()]
+    token = encode_cursor("reviews", values)
+    assert decode_cursor(token, "reviews", len(REVIEWS_SORT)) == values
+
+
+def test_round_trip_search_cursor():
+    oid = ObjectId()
+    token = encode_cursor("search:hybrid", ["text", 0.75, oid])
+    query = SearchQuery("laptop", {}, None, limit=10, cursor=token)
+    assert (query.seek_phase, query.seek_values) == ("text", [0.75, oid])
+    assert seek_filter(HYBRID_SORT, query.seek_values) == {"$or": [
+        {"hybrid_score": {"$lt": 0.75}},
+        {"hybrid_score": 0.75, "_id": {"$gt": oid}},
+    ]}
+
+
+@pytest.mark.parametrize("token", [
+    raw_token({"k": "reviews", "v": [1]}),
+    raw_token({"k": "reviews", "v": [1, 2, 3]}),
+    raw_token({"k": "reviews", "v": {"a": 1}}),
+    raw_token({"k": "reviews"}),
+    raw_token([1, 2]),
+    "not a cursor",
+    "",
+])
+def test_malformed_tokens(token):
+    with pytest.raises(InvalidCursor):
+        decode_cursor(token, "reviews", len(REVIEWS_SORT))
+
+
+def test_cursor_from_another_listing():
+    with pytest.raises(InvalidCursor):
+        decode_cursor(encode_cursor("user_orders", [datetime(2024, 1, 1), ObjectId()]), "reviews", 2)
+
+
+@pytest.mark.parametrize("values", [[], ["text"], ["text", 1.0], ["nowhere", 1.0, {"$oid": str(ObjectId())}]])
+def test_malformed_search_cursors(values):
+    with pytest.raises(InvalidCursor):
+        SearchQuery("laptop", {}, None, limit=10, cursor=raw_token({"k": "search:hybrid", "v": values}))
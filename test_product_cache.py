@@ -0,0 +1,73 @@
+# test_product_cache.py
+import asyncio
+from datetime import datetime, timedelta
+import mongomock_motor
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+from benchmarks import mongomock_compat
+from product_cache import CHANGE_STREAMS_UNSUPPORTED, ProductCache
+
+mongomock_compat.install()
+
+
+def test_falls_back_to_polling_without_change_streams():
+    async def scenario():
+        products = mongomock_motor.AsyncMongoMockClient()["product_cache_test"]["products"]
+        cache = ProductCache(max_entries=10, poll_interval=0.01)
+        cache.start(products)
+        await asyncio.sleep(0.05)
+        assert cache.mode == "polling"
+        await cache.stop()
+    asyncio.run(scenario())
+
+
+def test_standalone_server_falls_back_to_polling(monkeypatch):
+    async def scenario():
+        async def standalone(self, products_collection):
+            raise OperationFailure("only supported on replica sets", code=CHANGE_STREAMS_UNSUPPORTED)
+        monkeypatch.setattr(ProductCache, "_watch", standalone)
+        cache = ProductCache(max_entries=10, poll_interval=0.01)
+        cache.start(None)
+        await asyncio.sleep(0.05)
+        assert cache.mode == "polling"
+        await cache.stop()
+    asyncio.run(scenario())
+
+
+def test_listener_restarts_after_unexpected_errors(monkeypatch):
+    async def scenario():
+        calls = []
+
+        async def buggy_watch(self, products_collection):
+            calls.append(1)
+            raise KeyError("documentKey")
+        monkeypatch.setattr(ProductCache, "_watch", buggy_watch)
+        cache = ProductCache(max_entries=10, poll_interval=0.01)
+        cache.start(None)
+        await asyncio.sleep(0.05)
+        assert len(calls) > 1
+        assert not cache._task.done()
+        await cache.stop()
+    asyncio.run(scenario())
+
+
+def test_polling_survives_a_failing_change(monkeypatch):
+    async def scenario():
+        products = mongomock_motor.AsyncMongoMockClient()["product_cache_test"]["products"]
+        cache = ProductCache(max_entries=10, poll_interval=0.01)
+        cache._last_seen = datetime.utcnow() - timedelta(days=1)
+        seen = []
+
+        def flaky_apply_change(doc=None, deleted_id=None):
+            seen.append(doc["_id"])
+            if len(seen) == 1:
+                raise ValueError("bad document")
+        monkeypatch.setattr(cache, "apply_change", flaky_apply_change)
+        cache.start(products)
+        pid = ObjectId()
+        await products.insert_one({"_id": pid, "name": "Lamp", "price": 5.0, "updated_at": datetime.utcnow()})
+        await asyncio.sleep(0.1)
+        assert not cache._task.done()
+        assert seen.count(pid) >= 2
+        await cache.stop()
+    asyncio.run(scenario())
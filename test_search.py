@@ -0,0 +1,59 @@
+# test_search.py
+import asyncio
+import mongomock_motor
+from bson import ObjectId
+from benchmarks import mongomock_compat
+import search
+from config import settings
+from fuzzy_index import TrigramIndex
+from pagination import encode_cursor
+from search import SearchQuery
+
+mongomock_compat.install()
+
+
+def candidate_limit(query: SearchQuery) -> int:
+    return next(stage["$limit"] for stage in query.text_candidate_pipeline() if "$limit" in stage)
+
+
+def test_text_candidate_cap_covers_deep_skip_pages():
+    assert candidate_limit(SearchQuery("laptop", {}, None, limit=10)) == settings.text_candidate_limit
+    deep = SearchQuery("laptop", {}, None, limit=10, skip=settings.text_candidate_limit + 50)
+    assert candidate_limit(deep) == settings.text_candidate_limit + 60
+
+
+def test_only_first_hybrid_pages_use_candidates():
+    assert SearchQuery("laptop", {}, None, limit=10).uses_candidates()
+    assert not SearchQuery("laptop", {}, "price_asc", limit=10).uses_candidates()
+    cursor = encode_cursor("search:hybrid", ["text", 0.5, ObjectId()])
+    assert not SearchQuery("laptop", {}, None, limit=10, cursor=cursor).uses_candidates()
+
+
+def test_cursor_pages_reach_every_match(monkeypatch):
+    async def scenario():
+        products = mongomock_motor.AsyncMongoMockClient()["search_test"]["products"]
+        index = TrigramIndex()
+        for i in range(25):
+            doc = {"_id": ObjectId(), "name": f"Laptop model {i}", "category": "Laptops", "price": 100.0 + i,
+                   "popularity": i}
+            await products.insert_one(doc)
+            index.add_product(doc)
+        monkeypatch.setattr(search, "fuzzy_index", index)
+
+        async def no_text(self, collection):
+            return []
+        monkeypatch.setattr(SearchQuery, "_text_candidates", no_text)
+
+        first = SearchQuery("laptop", {}, None, limit=10)
+        phase, candidates, timed_out = await first.candidates(products)
+        assert phase == "fuzzy" and not timed_out
+        docs = [doc async for doc in products.aggregate(first.enrich_pipeline(candidates))]
+        seen, token = first.page(docs, phase)
+        seen = [doc["_id"] for doc in seen]
+        while token:
+            page = SearchQuery("laptop", {}, None, limit=10, cursor=token)
+            phase, docs = await page.sorted_page(products)
+            docs, token = page.page(docs, phase)
+            seen.extend(doc["_id"] for doc in docs)
+        assert len(seen) == len(set(seen)) == 25
+    asyncio.run(scenario())
@@ -0,0 +1,66 @@
+# test_search_cache.py
+import asyncio
+from search_cache import Computed, SearchCache
+
+
+def test_uncached_results_are_returned_but_not_stored():
+    async def scenario():
+        cache = SearchCache(max_entries=10, ttl_seconds=60, popularity_threshold=100)
+        calls = []
+
+        async def cut_short():
+            calls.append(1)
+            return Computed(([], None), store=False)
+        assert await cache.get_or_compute("k", cut_short) == ([], None)
+        assert await cache.get_or_compute("k", cut_short) == ([], None)
+        assert len(calls) == 2
+        assert cache.stats()["entries"] == 0
+    asyncio.run(scenario())
+
+
+def test_cancelled_leader_does_not_fail_waiters():
+    async def scenario():
+        cache = SearchCache(max_entries=10, ttl_seconds=60, popularity_threshold=100)
+
+        async def compute():
+            await asyncio.sleep(0.01)
+            return 42
+        leader = asyncio.ensure_future(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(cache.get_or_compute("k", compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+        assert await waiter == 42
+        assert cache.stats()["coalesced"] == 1
+    asyncio.run(scenario())
+
+
+def test_evict_products_drops_entries_showing_them():
+    async def scenario():
+        cache = SearchCache(max_entries=10, ttl_seconds=60, popularity_threshold=100)
+
+        async def listing(ids, sort):
+            return Computed((ids, sort), ids)
+        await cache.get_or_compute(("a", None), lambda: listing(["p1", "p2"], None))
+        await cache.get_or_compute(("b", None), lambda: listing(["p3"], None))
+        await cache.get_or_compute(("c", "rating"), lambda: listing(["p4"], "rating"))
+        cache.evict_products(["p2"], where=lambda key: key[-1] == "rating")
+        assert list(cache._entries) == [("b", None)]
+    asyncio.run(scenario())
+
+
+def test_results_computed_across_a_product_eviction_are_not_stored():
+    async def scenario():
+        cache = SearchCache(max_entries=10, ttl_seconds=60, popularity_threshold=100)
+        started = asyncio.Event()
+
+        async def slow_listing():
+            started.set()
+            await asyncio.sleep(0.01)
+            return Computed(["p1"], ["p1"])
+        task = asyncio.ensure_future(cache.get_or_compute("k", slow_listing))
+        await started.wait()
+        cache.evict_products(["p1"])
+        assert await task == ["p1"]
+        assert cache.stats()["entries"] == 0
+    asyncio.run(scenario())